@@ -1,38 +1,76 @@
-from fastapi import FastAPI, UploadFile, File, Request, HTTPException
+from fastapi import FastAPI, UploadFile, File, Request, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pytesseract
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Union
 from PIL import Image
-import io
 import re
 import random
-import pandas as pd
 import ast
+import codecs
+import hmac
+import json
+import os
+import time
+
+import metrics
+from shared_catalog import SharedCatalog, read_food_csv
+from catalog_import import DEFAULT_CHUNK_SIZE, CatalogImport, RowError
+from dosage_parser import extract_dosages
+from live_session import CompatibilitySession
+from drug_interactions import DEFAULT_CONFLICT_LIMIT, DRUG_FOOD_INTERACTIONS, InteractionIndex
+from upload_limits import ImageTooLarge, UploadLimitMiddleware, open_upload_image
 
 # Define the path to your food.csv file
 FOOD_CSV_PATH = "food.csv"
 
-# Load food data from CSV
-try:
-    foods_df = pd.read_csv(FOOD_CSV_PATH)
-    # Convert 'properties' column from string "item1,item2" to list ["item1", "item2"]
-    def parse_properties(prop_str):
-        if pd.isna(prop_str):
-            return []
-        if isinstance(prop_str, str):
-            return [p.strip() for p in prop_str.split(',')]
+# Admin endpoints (bulk catalog import) are disabled unless a token is set
+ADMIN_TOKEN = os.environ.get("NUTRISYNC_ADMIN_TOKEN")
+
+# Live compatibility sessions per worker; each holds two food records and a
+# few cached rule results, so the cap guards against leaks rather than memory
+MAX_LIVE_SESSIONS = int(os.environ.get("NUTRISYNC_MAX_LIVE_SESSIONS", "1000"))
+
+# Longest /plan_meal search; each one holds a threadpool thread for its budget
+MAX_PLAN_TIME_BUDGET_MS = 5000
+# Largest meal and most plans per /plan_meal request; the search space grows
+# with both, so bigger requests only burn their budget and come back empty
+MAX_PLAN_SIZE = 8
+MAX_PLAN_TOP_N = 20
+
+# Set to a snapshot directory (see shared_catalog.py) to attach workers to a
+# shared, read-only catalog instead of parsing food.csv in every process
+SHARED_CATALOG_DIR = os.environ.get("NUTRISYNC_SHARED_CATALOG")
+
+def load_foods(csv_path):
+    """Load food data from CSV"""
+    try:
+        foods = read_food_csv(csv_path)
+        print(f"Successfully loaded {len(foods)} foods from {csv_path}")
+        return foods
+    except Exception as e:
+        print(f"Error loading food.csv from {csv_path}: {e}")
         return []
 
-    foods_df['properties'] = foods_df['properties'].apply(parse_properties)
-    
-    FOODS = foods_df.to_dict('records')
-    print(f"Successfully loaded {len(FOODS)} foods from {FOOD_CSV_PATH}")
-except Exception as e:
-    print(f"Error loading food.csv from {FOOD_CSV_PATH}: {e}")
-    FOODS = []
+shared_catalog = None
+if SHARED_CATALOG_DIR:
+    shared_catalog = SharedCatalog.attach(SHARED_CATALOG_DIR)
+    FOODS = shared_catalog.foods
+    print(f"Attached to shared catalog generation {shared_catalog.generation} ({len(FOODS)} foods)")
+else:
+    FOODS = load_foods(FOOD_CSV_PATH)
+
+def index_foods(foods):
+    """Row position by id (the first row wins, as with a scan) and the set of rows per lowercase name"""
+    rows, rows_by_name = {}, {}
+    for row, food in enumerate(foods):
+        rows.setdefault(food["id"], row)
+        rows_by_name.setdefault(food["name"].lower(), set()).add(row)
+    return rows, rows_by_name
 
-# Keep a simple version for backward compatibility (used by frontend FoodOptions)
-FOOD_DB = [{"id": f["id"], "name": f["name"], "category": f["category"].title()} for f in FOODS]
+# Unused in shared mode, where the snapshot carries its own id and name indexes
+FOOD_ROWS, FOOD_ROWS_BY_NAME = index_foods(FOODS) if shared_catalog is None else ({}, {})
 
 
 app = FastAPI(title="NutriSync AI - Multi-Feature Health App", description="Food compatibility analysis, AI suggestions, and prescription scanning")
@@ -45,12 +83,51 @@ class CompatibilityRequest(BaseModel):
     season: str
     time: str
 
+class LiveCompatibilityUpdate(BaseModel):
+    # Fields left out keep their current value in the session
+    food1_id: Optional[int] = None
+    food2_id: Optional[int] = None
+    age: Optional[int] = None
+    season: Optional[str] = None
+    time: Optional[str] = None
+    seq: Optional[int] = None
+
 class SuggestionRequest(BaseModel):
     age: int
     season: str
     time: str
     disease: str = "none"
 
+class MealPlanRequest(BaseModel):
+    age: int
+    season: str
+    time: str
+    size: int = Field(3, ge=1, le=MAX_PLAN_SIZE)
+    categories: Optional[List[str]] = Field(None, max_length=MAX_PLAN_SIZE)
+    exclude_foods: List[Union[int, str]] = []
+    exclude_properties: List[str] = []
+    required_properties: List[str] = []
+    top_n: int = Field(3, ge=1, le=MAX_PLAN_TOP_N)
+    time_budget_ms: int = 1000
+
+class InteractionRequest(BaseModel):
+    medicines: List[str]
+    food_ids: Optional[List[int]] = None
+    food_names: Optional[List[str]] = None
+    limit: int = DEFAULT_CONFLICT_LIMIT
+
+class SimilarFoodsRequest(BaseModel):
+    food_id: Optional[int] = None
+    food_name: Optional[str] = None
+    properties: List[str] = []
+    require: List[str] = []
+    exclude: List[str] = []
+    limit: int = 10
+    metric: str = "jaccard"
+
+# Reject oversized /scan uploads while they stream in
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -60,33 +137,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Comprehensive food database with nutritional properties
-import pandas as pd
-import ast
-
-# Load food data from CSV
-try:
-    foods_df = pd.read_csv("food.csv")
-    # Convert 'properties' column from string "item1,item2" to list ["item1", "item2"]
-    # Handle potentially malformed strings or empty values
-    def parse_properties(prop_str):
-        if pd.isna(prop_str):
-            return []
-        if isinstance(prop_str, str):
-            # If it's a comma-separated string
-            return [p.strip() for p in prop_str.split(',')]
-        return []
-
-    foods_df['properties'] = foods_df['properties'].apply(parse_properties)
-    
-    FOODS = foods_df.to_dict('records')
-except Exception as e:
-    print(f"Error loading food.csv: {e}")
-    FOODS = []
-
-# Keep a simple version for backward compatibility
-FOOD_DB = [{"id": f["id"], "name": f["name"], "category": f["category"].title()} for f in FOODS]
-
 # Medicine database for prescription scanner
 MEDICINE_DB = {
     "paracetamol": {
@@ -105,12 +155,118 @@ MEDICINE_DB = {
 
 # Helper functions
 def get_food_by_id(food_id: int):
-    for food in FOODS:
-        if food["id"] == food_id:
-            return food
-    return None
+    if shared_catalog is not None:
+        return shared_catalog.get(food_id)
+    row = FOOD_ROWS.get(food_id)
+    return FOODS[row] if row is not None else None
+
+def get_food_by_name(name: str):
+    name = name.strip().lower()
+    if shared_catalog is not None:
+        return shared_catalog.get_by_name(name)
+    rows = FOOD_ROWS_BY_NAME.get(name)
+    return FOODS[min(rows)] if rows else None
 
 from biochemical_engine import engine
+from meal_planner import MealPlanner
+
+from similarity_index import PropertySimilarityIndex
+
+from catalog_bundle import MAX_SCORE_TABLE_FOODS, CatalogPublisher, catalog_arrays
+from compatibility_analytics import TABLES as ANALYTICS_TABLES, CompatibilityAnalytics, table_to_arrow, table_to_csv
+
+engine.probe = metrics.SectionProbe()
+meal_planner = MealPlanner(engine, FOODS)
+catalog_publisher = CatalogPublisher()
+catalog_publisher.publish(FOODS, shared_catalog.arrays if shared_catalog is not None else None)
+compatibility_analytics = CompatibilityAnalytics()
+meal_planner.record_cache = metrics.record_cache
+catalog_publisher.record_cache = metrics.record_cache
+compatibility_analytics.record_cache = metrics.record_cache
+if shared_catalog is not None:
+    interaction_index = InteractionIndex(DRUG_FOOD_INTERACTIONS, catalog=shared_catalog)
+    similarity_index = shared_catalog.similarity_index()
+else:
+    interaction_index = InteractionIndex(DRUG_FOOD_INTERACTIONS, FOODS)
+    similarity_index = PropertySimilarityIndex(FOODS)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time every request by route and optionally profile it"""
+    profile = metrics.profiler.start() if metrics.profiler.wants(request.headers) else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Label by route template rather than raw path to keep cardinality bounded
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, request.method, route_path, str(status))
+        if profile is not None:
+            # The path stays in the server log; clients have no use for it
+            print(f"Profiled {request.method} {route_path}: {metrics.profiler.finish(profile, route_path)}")
+    return response
+
+@app.middleware("http")
+async def refresh_shared_catalog(request: Request, call_next):
+    """Re-attach to the shared catalog when the loader publishes a new generation"""
+    global shared_catalog, FOODS, similarity_index, interaction_index
+    if shared_catalog is not None and shared_catalog.is_stale():
+        try:
+            attached = SharedCatalog.attach(SHARED_CATALOG_DIR)
+        except OSError as e:
+            # Keep serving the generation already mapped; the next check retries
+            print(f"Could not re-attach to shared catalog: {e}")
+            return await call_next(request)
+        shared_catalog = attached
+        FOODS = shared_catalog.foods
+        meal_planner.foods = FOODS
+        similarity_index = shared_catalog.similarity_index()
+        catalog_publisher.publish(FOODS, shared_catalog.arrays)
+        interaction_index = InteractionIndex(DRUG_FOOD_INTERACTIONS, catalog=shared_catalog)
+        print(f"Re-attached to shared catalog generation {shared_catalog.generation}")
+    return await call_next(request)
+
+def apply_catalog_chunk(foods):
+    """Upsert validated foods into FOODS and every index built on it"""
+    start = len(FOODS)
+    replaced = {}  # row -> food
+    appended = []
+    for food in foods:
+        row = FOOD_ROWS.get(food["id"])
+        if row is None:
+            FOOD_ROWS[food["id"]] = start + len(appended)
+            appended.append(food)
+        elif row >= start:
+            # Same new id twice in one chunk; the later row wins
+            appended[row - start] = food
+        else:
+            replaced[row] = food
+
+    for row, food in replaced.items():
+        previous = FOODS[row]
+        FOODS[row] = food
+        interaction_index.upsert(food, previous)
+        old_name = previous["name"].lower()
+        if old_name != food["name"].lower():
+            FOOD_ROWS_BY_NAME[old_name].discard(row)
+            if not FOOD_ROWS_BY_NAME[old_name]:
+                del FOOD_ROWS_BY_NAME[old_name]
+            FOOD_ROWS_BY_NAME.setdefault(food["name"].lower(), set()).add(row)
+    FOODS.extend(appended)
+    for row, food in enumerate(appended, start):
+        interaction_index.upsert(food)
+        FOOD_ROWS_BY_NAME.setdefault(food["name"].lower(), set()).add(row)
+
+    similarity_index.upsert(list(replaced) + list(range(start, len(FOODS))), list(replaced.values()) + appended)
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set NUTRISYNC_ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 def calculate_compatibility(food1, food2, age, season, time):
     """Calculate food compatibility using the BioChemicalEngine"""
@@ -170,10 +326,14 @@ def generate_suggestions(age, season, time, disease):
 
     # Process the suggestions pool
     final_suggestions = []
-    # Convert food objects to their names and deduplicate
+    seen = set()
+    # Convert food objects to their names and deduplicate; only the first 8 are kept
     for food in suggestions_pool:
-        if food["name"] not in final_suggestions:
+        if food["name"] not in seen:
+            seen.add(food["name"])
             final_suggestions.append(food["name"])
+            if len(final_suggestions) == 8:
+                break
 
     # Prioritize unique suggestions and limit to 8
     suggestions = final_suggestions[:8]
@@ -307,20 +467,32 @@ def extract_medicine_names(text):
 @app.post("/scan")
 async def scan_prescription(file: UploadFile = File(...)):
     """Scan prescription image and extract medicine information"""
+    # pytesseract imports pandas when it is installed; only scans need either
+    import pytesseract
+
     try:
-        # Read and process image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
+        # Open the spooled upload in place; the pixel limit is checked from the
+        # image header before any decoding happens
+        decode_started = time.perf_counter()
+        with open_upload_image(file) as image:
+            metrics.SCAN_STAGE_LATENCY.observe(time.perf_counter() - decode_started, "decode")
 
-        # Configure Tesseract for better accuracy
-        custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-() '
-        text = pytesseract.image_to_string(image, config=custom_config)
+            # Configure Tesseract for better accuracy
+            custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-() '
+            with metrics.SCAN_STAGE_LATENCY.time("ocr"):
+                text = pytesseract.image_to_string(image, config=custom_config)
 
         # Preprocess extracted text
-        cleaned_text = preprocess_text(text)
+        with metrics.SCAN_STAGE_LATENCY.time("preprocess"):
+            cleaned_text = preprocess_text(text)
 
         # Extract medicine names
-        medicine_names = extract_medicine_names(cleaned_text)
+        with metrics.SCAN_STAGE_LATENCY.time("match"):
+            medicine_names = extract_medicine_names(cleaned_text)
+
+        # Strength, frequency and duration next to each medicine
+        with metrics.SCAN_STAGE_LATENCY.time("dosage"):
+            dosages = extract_dosages(cleaned_text, medicine_names)
 
         # Build medicine information
         found_medicines = []
@@ -328,7 +500,9 @@ async def scan_prescription(file: UploadFile = File(...)):
             if med_name in MEDICINE_DB:
                 found_medicines.append({
                     "medicine": med_name.title(),
-                    **MEDICINE_DB[med_name]
+                    **MEDICINE_DB[med_name],
+                    "dosage": dosages[med_name],
+                    "food_interactions": interaction_index.for_medicine(med_name)
                 })
 
         return {
@@ -340,6 +514,12 @@ async def scan_prescription(file: UploadFile = File(...)):
             "note": "This app provides general information about common medications. It does not provide medical advice, diagnosis, or treatment recommendations."
         }
 
+    except (ImageTooLarge, Image.DecompressionBombError) as e:
+        return JSONResponse(status_code=413, content={
+            "success": False,
+            "error": f"Image too large: {str(e)}",
+            "disclaimer": "MEDICAL DISCLAIMER: This information is for educational purposes only and is not a substitute for professional medical advice."
+        })
     except Exception as e:
         return {
             "success": False,
@@ -366,6 +546,11 @@ async def get_medicines():
         "disclaimer": "This is a limited database for demonstration purposes."
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/foods")
 async def get_foods():
     """Get list of available foods"""
@@ -383,16 +568,271 @@ async def predict_compatibility(request: CompatibilityRequest):
     result = calculate_compatibility(food1, food2, request.age, request.season, request.time)
     return result
 
+@app.websocket("/ws/compatibility")
+async def live_compatibility(websocket: WebSocket):
+    """Live compatibility session.
+
+    The client sends JSON updates with only the inputs that changed (see
+    LiveCompatibilityUpdate); each update is answered with the new result
+    and the rule sections that had to be re-run.
+    """
+    if metrics.LIVE_SESSIONS.get() >= MAX_LIVE_SESSIONS:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+
+    # Take the slot before the first await so concurrent handshakes cannot
+    # all pass the check above
+    metrics.LIVE_SESSIONS.inc()
+    try:
+        await websocket.accept()
+        session = CompatibilitySession(engine)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is None:
+                # 1003: updates are JSON text frames; binary is not supported
+                await websocket.close(code=1003)
+                break
+            try:
+                update = LiveCompatibilityUpdate(**json.loads(message["text"]))
+            except (ValueError, TypeError, ValidationError) as e:
+                await websocket.send_json({"type": "error", "error": f"Invalid update: {e}"})
+                continue
+
+            foods = []
+            for food_id in (update.food1_id, update.food2_id):
+                food = get_food_by_id(food_id) if food_id is not None else None
+                if food_id is not None and not food:
+                    break
+                foods.append(food)
+            if len(foods) < 2:
+                await websocket.send_json({"type": "error", "seq": update.seq, "error": "Food not found"})
+                continue
+
+            recomputed = session.update(foods[0], foods[1], update.age, update.season, update.time)
+            for section in recomputed:
+                metrics.LIVE_SECTIONS_RECOMPUTED.inc(section)
+            await websocket.send_json({
+                "type": "result",
+                "seq": update.seq,
+                "result": session.result(),
+                "recomputed": recomputed,
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.LIVE_SESSIONS.dec()
+
 @app.post("/suggest_foods")
 async def suggest_foods(request: SuggestionRequest):
     """Generate food suggestions based on user profile"""
     result = generate_suggestions(request.age, request.season, request.time, request.disease)
     return result
 
+@app.post("/plan_meal")
+async def plan_meal(request: MealPlanRequest):
+    """Find the most compatible multi-food meals for a user profile"""
+    if not 1 <= request.time_budget_ms <= MAX_PLAN_TIME_BUDGET_MS:
+        raise HTTPException(status_code=400, detail=f"time_budget_ms must be between 1 and {MAX_PLAN_TIME_BUDGET_MS}")
+
+    # The search is CPU-bound for the whole budget; keep the event loop free
+    result = await run_in_threadpool(
+        meal_planner.plan,
+        request.age,
+        request.season,
+        request.time,
+        size=request.size,
+        categories=request.categories,
+        exclude_foods=request.exclude_foods,
+        exclude_properties=request.exclude_properties,
+        required_properties=request.required_properties,
+        top_n=request.top_n,
+        time_budget=request.time_budget_ms / 1000,
+        catalog_version=catalog_publisher.version,
+    )
+    metrics.record_cache("meal_planner_pairs", result["stats"]["cache_hits"], result["stats"]["pairs_scored"])
+    return result
+
+@app.post("/similar_foods")
+async def similar_foods(request: SimilarFoodsRequest):
+    """Find substitute foods with overlapping nutritional properties"""
+    if request.metric not in ("jaccard", "weighted"):
+        raise HTTPException(status_code=400, detail="Metric must be 'jaccard' or 'weighted'")
+
+    food = None
+    if request.food_id is not None:
+        food = get_food_by_id(request.food_id)
+    elif request.food_name:
+        food = get_food_by_name(request.food_name)
+    if (request.food_id is not None or request.food_name) and not food:
+        raise HTTPException(status_code=404, detail="Food not found")
+    if not food and not request.properties:
+        raise HTTPException(status_code=400, detail="Provide a food or a list of properties")
+
+    results = similarity_index.similar(
+        food=food,
+        properties=request.properties,
+        require=request.require,
+        exclude=request.exclude,
+        limit=request.limit,
+        metric=request.metric,
+    )
+    return {
+        "query": food["name"] if food else None,
+        "count": len(results),
+        "foods": results,
+    }
+
+@app.post("/check_interactions")
+async def check_interactions(request: InteractionRequest):
+    """Check scanned medicines against a meal, or against the whole catalog if no foods are given"""
+    unknown = [m for m in request.medicines if m.lower() not in MEDICINE_DB]
+    if not 1 <= request.limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+
+    foods = None
+    if request.food_ids is not None or request.food_names is not None:
+        foods = []
+        for food_id in request.food_ids or []:
+            food = get_food_by_id(food_id)
+            if not food:
+                raise HTTPException(status_code=404, detail=f"Food {food_id} not found")
+            foods.append(food)
+        if request.food_names:
+            wanted = {name.strip().lower() for name in request.food_names}
+            by_name = {}
+            for name in wanted:
+                food = get_food_by_name(name)
+                if food:
+                    by_name[name] = food
+            missing = sorted(wanted - set(by_name))
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Foods not found: {', '.join(missing)}")
+            foods.extend(by_name.values())
+
+    conflicts, total = interaction_index.conflicts(request.medicines, foods, request.limit)
+    return {
+        "conflicts": conflicts,
+        "count": total,
+        "truncated": total > len(conflicts),
+        "unknown_medicines": unknown,
+        "disclaimer": "MEDICAL DISCLAIMER: This information is for educational purposes only and is not a substitute for professional medical advice."
+    }
+
+@app.get("/catalog/bundle")
+async def get_catalog_bundle(request: Request, include_scores: bool = False):
+    """Versioned catalog for offline clients, optionally with the precomputed score table"""
+    if include_scores and not catalog_publisher.has_score_table:
+        raise HTTPException(status_code=413, detail=f"The score table is only offered for catalogs of up to "
+                                                    f"{MAX_SCORE_TABLE_FOODS} foods; request the bundle without include_scores")
+    etag = f'"{catalog_publisher.version}{"-scores" if include_scores else ""}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    # Encoding a large catalog takes a while, so keep it off the event loop
+    bundle = await run_in_threadpool(catalog_publisher.bundle, include_scores)
+    return JSONResponse(bundle, headers={"ETag": etag})
+
+@app.get("/catalog/delta")
+async def get_catalog_delta(since: str):
+    """Catalog rows changed since the version a client already holds"""
+    return catalog_publisher.delta(since)
+
+@app.get("/analytics/compatibility")
+async def get_compatibility_analytics(age: int = 30, season: str = "any", time: str = "day",
+                                      format: str = "json", table: str = "categories"):
+    """Compatibility aggregated by category pair, property and rule over every food pair.
+
+    JSON returns all tables; format=csv or arrow returns the one named by
+    `table` as a columnar file. Results are cached per catalog version.
+    """
+    if format not in ("json", "csv", "arrow"):
+        raise HTTPException(status_code=400, detail="Format must be 'json', 'csv' or 'arrow'")
+    if table not in ANALYTICS_TABLES:
+        raise HTTPException(status_code=400, detail=f"Table must be one of: {', '.join(ANALYTICS_TABLES)}")
+    # Seconds of NumPy work for large catalogs on a cache miss
+    result = await run_in_threadpool(compatibility_analytics.get, catalog_publisher.version,
+                                     catalog_publisher.foods, age, season, time)
+    headers = {"X-Catalog-Version": result["version"]}
+    if format == "json":
+        return JSONResponse(result, headers=headers)
+    if format == "csv":
+        return PlainTextResponse(table_to_csv(result["tables"][table]), media_type="text/csv", headers=headers)
+    try:
+        body = table_to_arrow(result["tables"][table])
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return Response(body, media_type="application/vnd.apache.arrow.stream", headers=headers)
+
+# Stats of the running (or last) bulk import, for GET /admin/catalog/import
+catalog_import_status = {"running": False}
+
+@app.post("/admin/catalog/import")
+async def import_catalog(request: Request, format: str = "ndjson", chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False):
+    """Stream CSV or NDJSON foods from the request body into the live catalog.
+
+    Rows are upserted chunk by chunk, so the new foods are served as soon
+    as their chunk is applied. Only this process is updated; merge the
+    same file into food.csv with catalog_import.py to keep it.
+    """
+    global catalog_import_status
+    require_admin(request)
+    if shared_catalog is not None:
+        raise HTTPException(status_code=409, detail="The catalog is a read-only shared snapshot; rebuild it with shared_catalog.py")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'ndjson'")
+    if not 1 <= chunk_size <= 100_000:
+        raise HTTPException(status_code=400, detail="chunk_size must be between 1 and 100000")
+    if catalog_import_status["running"]:
+        raise HTTPException(status_code=409, detail="An import is already running")
+
+    def on_progress(stats):
+        catalog_import_status.update(stats)
+        if stats["chunks"] % 100 == 0:
+            print(f"Catalog import: {stats['rows']:,} rows, {stats['imported']:,} imported, "
+                  f"{stats['rejected']:,} rejected ({stats['rows_per_second']:,} rows/s)")
+
+    apply = (lambda chunk: None) if dry_run else apply_catalog_chunk
+    importer = CatalogImport(format, apply, chunk_size, on_progress=on_progress)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    catalog_import_status = {"running": True, "dry_run": dry_run, **importer.progress()}
+    try:
+        async for data in request.stream():
+            importer.feed(decoder.decode(data))
+        importer.feed(decoder.decode(b"", final=True))
+        stats = importer.close()
+    except (RowError, UnicodeDecodeError) as e:
+        catalog_import_status.update(importer.progress(), running=False, error=str(e))
+        raise HTTPException(status_code=400, detail=f"Import stopped after {importer.stats['rows']} rows: {e}")
+    finally:
+        if not dry_run and importer.stats["imported"]:
+            catalog_publisher.publish(FOODS)
+        catalog_import_status["running"] = False
+
+    catalog_import_status.update(stats)
+    print(f"Catalog import finished: {stats['imported']:,} imported, {stats['rejected']:,} rejected "
+          f"in {stats['seconds']}s ({stats['rows_per_second']:,} rows/s)")
+    return {"success": True, **stats, "foods": len(FOODS), "version": catalog_publisher.version}
+
+@app.get("/admin/catalog/import")
+async def get_import_status(request: Request):
+    """Progress of the running bulk import, or the result of the last one"""
+    require_admin(request)
+    return catalog_import_status
+
 if __name__ == "__main__":
     import uvicorn
     print("Starting NutriSync AI - Multi-Feature Health App...")
     print("Food database loaded:", len(FOODS), "foods with nutritional properties")
     print("Medicine database loaded:", len(MEDICINE_DB), "medicines")
     print("Remember: This is for educational purposes only!")
-    uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
+    workers = int(os.environ.get("NUTRISYNC_WORKERS", "1"))
+    if workers > 1:
+        # Parse the catalog once here and let every worker attach to it
+        from shared_catalog import build_snapshot, default_dir
+        os.environ.setdefault("NUTRISYNC_SHARED_CATALOG", default_dir())
+        build_snapshot(FOODS, os.environ["NUTRISYNC_SHARED_CATALOG"], arrays=catalog_arrays(FOODS))
+        uvicorn.run("backend:app", host="0.0.0.0", port=8002, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
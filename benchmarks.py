@@ -0,0 +1,744 @@
+"""Micro-benchmarks for the compatibility engine, suggestions, search and OCR matching.
+
+Synthetic catalogs are generated by scaling food.csv (renamed copies with
+shuffled properties) and MEDICINE_DB (made-up drug names around the real
+ones), so results are comparable between machines and runs.
+
+    python benchmarks.py                                   # 1k/100k/1M foods, 50k medicines
+    python benchmarks.py --sizes 1000 --output before.json
+    python benchmarks.py --sizes 1000 --compare before.json
+
+Each run also performs a differential check: every optimized code path is
+run against a straightforward reference implementation on the same
+synthetic data and must produce exactly the same output. Dosage
+extraction is checked against the details its synthetic prescriptions
+were generated from, the engine's rule sections and live sessions
+against the original single-function analyze_compatibility, and the
+vectorized analytics rule sections against the engine's own sections.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import cycle
+
+import numpy as np
+import pandas as pd
+
+import backend
+from biochemical_engine import SmartSearchModule, engine
+from compatibility_analytics import CONTEXT_AGES, CONTEXT_SEASONS, CONTEXT_TIMES, analyze, section_grid
+from dosage_parser import extract_dosages
+from food_classes import FoodClasses
+from live_session import CompatibilitySession
+from shared_catalog import SharedCatalog, build_snapshot
+from similarity_index import PropertySimilarityIndex
+
+SEASONS = ["summer", "winter", "rainy", "any"]
+TIMES = ["day", "night"]
+AGES = [10, 25, 40, 65]
+DISEASES = ["none", "diabetes", "hypertension", "anemia", "gut", "cholesterol"]
+SYLLABLES = ["ab", "cor", "dex", "fen", "gli", "hal", "ket", "lor", "mer", "nol",
+             "pra", "quin", "ril", "sar", "tan", "vir", "xin", "zol", "ol", "am"]
+
+
+# --- Synthetic data -------------------------------------------------------
+
+def synthetic_foods(n, seed=0):
+    """Scale food.csv to `n` rows; the first copy of each base food keeps its name"""
+    rng = random.Random(seed)
+    base = backend.load_foods(backend.FOOD_CSV_PATH)
+    vocab = sorted({p for f in base for p in f["properties"]})
+    foods = []
+    for i in range(n):
+        template = base[i % len(base)]
+        props = list(template["properties"])
+        if i >= len(base):
+            rng.shuffle(props)
+            props = props[:max(1, len(props) - rng.randint(0, 2))]
+            props += rng.sample(vocab, rng.randint(0, 2))
+            props = list(dict.fromkeys(props))
+        name = template["name"] if i < len(base) else f"{template['name']} {i}"
+        foods.append({
+            "id": i + 1,
+            "name": name,
+            "category": template["category"],
+            "season": template["season"],
+            "properties": props,
+        })
+    return foods
+
+
+def synthetic_medicines(n, seed=0):
+    """Grow MEDICINE_DB to `n` entries with pronounceable fake drug names"""
+    rng = random.Random(seed)
+    medicines = dict(backend.MEDICINE_DB)
+    templates = list(backend.MEDICINE_DB.values())
+    while len(medicines) < n:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5)))
+        medicines.setdefault(name, rng.choice(templates))
+    return medicines
+
+
+def synthetic_prescription(medicines, n_lines=12, seed=0):
+    rng = random.Random(seed)
+    names = list(medicines)
+    lines = ["Dr. A. Example MBBS", "Patient: J. Doe  Age: 45", "Rx"]
+    for _ in range(n_lines):
+        lines.append(f"Tab {rng.choice(names).title()} 500mg 1-0-1 x 5 days")
+    lines.append("Review after one week")
+    return backend.preprocess_text("\n".join(lines))
+
+
+DOSE_STRENGTHS = ["5mg", "10 mg", "250mg", "500 mg", "875/125 mg", "100mcg", "5 ml", "2.5ml"]
+DOSE_FREQUENCIES = [("1-0-1", 2), ("1-1-1", 3), ("0-0-1", 1), ("1-1-1-1", 4), ("BD", 2), ("TDS", 3),
+                    ("OD", 1), ("q6h", 4), ("twice daily", 2), ("SOS", None)]
+DOSE_DURATIONS = [("x {n} days", 1), ("for {n} days", 1), ("x {n} weeks", 7), ("{n}/7", 1), ("for {n} month", 30)]
+
+
+def synthetic_dosage_prescription(names, n_lines, seed=0):
+    """Multi-page prescription text plus the details expected for each medicine.
+
+    Each line prescribes one of `names` with a strength, frequency and
+    duration; the expected details are those of a medicine's first line.
+    """
+    rng = random.Random(seed)
+    lines = ["Dr. A. Example MBBS", "Patient: J. Doe  Age: 45", "Rx"]
+    expected = {}
+    for i in range(n_lines):
+        name = rng.choice(names)
+        strength = rng.choice(DOSE_STRENGTHS)
+        frequency, per_day = rng.choice(DOSE_FREQUENCIES)
+        duration, unit_days = rng.choice(DOSE_DURATIONS)
+        n = rng.randint(1, 6)
+        duration = duration.format(n=n)
+        lines.append(f"{rng.choice(['Tab', 'Cap', 'Syp'])} {name.title()} {strength} {frequency} {duration}")
+        expected.setdefault(name, (strength, per_day, n * unit_days))
+        if i % 40 == 39:
+            lines.append("Page break - continued overleaf")
+    lines.append("Review after one week")
+    return backend.preprocess_text("\n".join(lines)), expected
+
+
+def dosage_names(medicines, n):
+    """`n` medicine names where no name is mistaken for another by the partial-match rule"""
+    names = []
+    for name in sorted(medicines):
+        if any(other.startswith(name[:-2]) or name.startswith(other[:-2]) for other in names):
+            continue
+        names.append(name)
+        if len(names) == n:
+            break
+    return names
+
+
+# --- Reference implementations -------------------------------------------
+# Plain versions of code paths that have (or may get) faster implementations.
+# The differential check requires the live code to match these exactly.
+
+def reference_get_food_by_id(foods, food_id):
+    for food in foods:
+        if food["id"] == food_id:
+            return food
+    return None
+
+
+def reference_get_food_by_name(foods, name):
+    name = name.strip().lower()
+    return next((f for f in foods if f["name"].lower() == name), None)
+
+
+def reference_analyze_compatibility(f1, f2, age=25, season="any", time="day"):
+    """analyze_compatibility as one function, before it was split into RULE_SECTIONS"""
+    food1_name = f1["name"].lower()
+    food2_name = f2["name"].lower()
+
+    # Ensure properties are sets for O(1) lookups
+    f1_props = set(f1['properties'])
+    f2_props = set(f2['properties'])
+
+    score = 5.0  # Base score out of 10
+    pros = []
+    cons = []
+
+    # --- 1. NUTRITIONAL COMPLEMENTARITY ANALYSIS ---
+    # Excellent pairings
+    excellent_pairs = [
+        ({"potassium", "energy", "digestive"}, {"calcium", "protein", "hydration"}),  # Banana + Milk
+        ({"carbs", "energy", "fiber"}, {"omega_3", "protein", "vitamin_d"}),  # Rice + Fish
+        ({"iron", "vitamin_k", "folate"}, {"vitamin_c", "fiber", "antioxidants"}),  # Spinach + Tomato
+        ({"protein", "iron", "b_vitamins"}, {"vitamin_c", "fiber", "beta_carotene"}),  # Chicken + Carrot
+    ]
+
+    for nutrients_a, nutrients_b in excellent_pairs:
+        if (nutrients_a.issubset(f1_props) and nutrients_b.issubset(f2_props)) or \
+           (nutrients_a.issubset(f2_props) and nutrients_b.issubset(f1_props)):
+            score += 2.5
+            pros.append("Excellent nutritional complementarity - nutrients enhance each other's absorption")
+            break
+
+    # Good pairings
+    good_pairs = [
+        ({"vitamin_c", "fiber", "antioxidants"}, {"vitamin_c", "fiber", "antioxidants"}),  # Fruits together
+        ({"protein", "iron"}, {"vitamin_c"}),  # Protein + Vitamin C source
+        ({"carbs", "fiber"}, {"protein"}),  # Carbs + Protein
+    ]
+
+    for nutrients_a, nutrients_b in good_pairs:
+        # Check if pair matches (avoiding duplicate credit if already matched excellent)
+        if (nutrients_a.issubset(f1_props) and nutrients_b.issubset(f2_props)) or \
+           (nutrients_a.issubset(f2_props) and nutrients_b.issubset(f1_props)):
+            # Only add if we didn't already add a generic "nutritional complementarity" pro
+            if not any("nutritional complementarity" in p for p in pros):
+                score += 1.5
+                pros.append("Good nutritional balance - complementary nutrients")
+            break
+
+    # --- 2. DIGESTIVE COMPATIBILITY ANALYSIS ---
+    if "heavy" in f1_props and "heavy" in f2_props:
+        score -= 2.0
+        cons.append("Both foods are heavy and may cause digestive discomfort")
+
+    # Sour + Milk check
+    # Check properties and names for "milk"
+    is_f1_milk = "milk" in food1_name
+    is_f2_milk = "milk" in food2_name
+
+    if (("sour" in f1_props or "acidic" in f1_props or "citrus" in f1_props) and is_f2_milk) or \
+       (is_f1_milk and ("sour" in f2_props or "acidic" in f2_props or "citrus" in f2_props)):
+        score -= 2.5
+        cons.append("Sour/Acidic foods can curdle milk and cause digestive issues")
+
+    # Heating + Heating in Summer check
+    if "heating" in f1_props and "heating" in f2_props and season == "summer":
+        score -= 1.5
+        cons.append("Too much heating foods in summer can cause discomfort")
+
+    # --- 3. TRADITIONAL WISDOM ANALYSIS ---
+    traditional_good = [
+        ("milk", "banana"), ("rice", "fish"), ("lentils", "rice"),
+        ("bread", "cheese"), ("spinach", "potato"), ("ginger", "honey")
+    ]
+
+    traditional_bad = [
+        ("milk", "fish"), ("milk", "sour fruits"), ("honey", "heating foods"),
+        ("spinach", "potato"), ("coffee", "milk")
+    ]
+
+    for food_a, food_b in traditional_good:
+        if (food1_name == food_a and food2_name == food_b) or \
+           (food1_name == food_b and food2_name == food_a):
+            score += 2.0
+            pros.append("Traditional combination proven effective in many cultures")
+            break
+
+    for food_a, food_b in traditional_bad:
+        if (food1_name == food_a and food2_name == food_b) or \
+           (food1_name == food_b and food2_name == food_a):
+            score -= 2.0
+            cons.append("Traditionally considered incompatible in many culinary traditions")
+            break
+
+    # --- 4. AGE-APPROPRIATE ANALYSIS ---
+    if age < 18:
+        if ("calcium" in f1_props or "calcium" in f2_props) and \
+           ("protein" in f1_props or "protein" in f2_props):
+            score += 1.0
+            pros.append("Excellent for growing children - provides calcium and protein")
+        elif "calcium" in f1_props or "calcium" in f2_props:
+            score += 0.5
+            pros.append("Good calcium source for children's bone development")
+    elif age > 50:
+        if ("vitamin_d" in f1_props or "vitamin_d" in f2_props) and \
+           ("fiber" in f1_props or "fiber" in f2_props):
+            score += 1.0
+            pros.append("Beneficial for older adults - vitamin D and fiber support health")
+    elif age > 30:
+        nutrient_diversity = len(f1_props.union(f2_props))
+        if nutrient_diversity >= 6:
+            score += 0.5
+            pros.append("Good nutrient diversity for adult health")
+
+    # --- 5. SEASONAL APPROPRIATENESS ---
+    if season == "summer":
+        cooling_foods = ["cooling", "hydration"]
+
+        f1_cooling = any(p in f1_props for p in cooling_foods)
+        f2_cooling = any(p in f2_props for p in cooling_foods)
+        f1_heating = "heating" in f1_props
+        f2_heating = "heating" in f2_props
+
+        if f1_cooling and f2_cooling:
+            score += 1.5
+            pros.append("Perfect summer combination - both cooling and hydrating")
+        elif (f1_cooling and not f2_heating) or (f2_cooling and not f1_heating):
+            # FIX: Only add cooling bonus if the OTHER food is NOT heating
+            score += 0.5
+            pros.append("Good summer choice - provides cooling effect")
+
+        # Note: Heating + Heating check was done in Digestive section, but we can verify here too if needed.
+        # Already handled above.
+
+    elif season == "winter":
+        if ("immune_boost" in f1_props or "immune_boost" in f2_props) and \
+           ("heating" in f1_props or "heating" in f2_props):
+            score += 1.5
+            pros.append("Excellent winter combination - immune support and warming effect")
+        elif "immune_boost" in f1_props or "immune_boost" in f2_props:
+            score += 0.5
+            pros.append("Good immune support for winter health")
+
+    elif season == "rainy":
+        if "digestive" in f1_props and "digestive" in f2_props:
+            score += 1.0
+            pros.append("Good digestive support during rainy season")
+        if "mucus_forming" in f1_props or "mucus_forming" in f2_props:
+            score -= 1.0
+            cons.append("May increase mucus formation during humid rainy season")
+
+    # --- 6. TIME OF DAY CONSIDERATIONS ---
+    if time == "day":
+        if ("energy" in f1_props or "energy" in f2_props) and \
+           ("light" in f1_props or "light" in f2_props):
+            score += 1.0
+            pros.append("Perfect daytime combination - energizing yet easy to digest")
+        elif "energy" in f1_props or "energy" in f2_props:
+            score += 0.5
+            pros.append("Good energy source for daytime activities")
+
+        if age > 30 and "heavy" in f1_props and "heavy" in f2_props:
+            score -= 0.5
+            cons.append("May cause sluggishness during workday")
+
+    elif time == "night":
+        if "digestive" in f1_props and "digestive" in f2_props:
+            score += 1.0
+            pros.append("Excellent evening combination - promotes good digestion and sleep")
+        elif "digestive" in f1_props or "digestive" in f2_props:
+            score += 0.5
+            pros.append("Supports digestion before sleep")
+
+        if ("heating" in f1_props and "heating" in f2_props) or \
+           ("stimulant" in f1_props or "stimulant" in f2_props):
+            score -= 1.0
+            cons.append("May interfere with sleep quality")
+
+    # --- 7. SCIENTIFIC EVIDENCE-BASED RULES ---
+    # Vitamin C + Iron (Fixing potential duplication if handled in good pairs)
+    has_iron = "iron" in f1_props or "iron" in f2_props
+    has_vit_c = "vitamin_c" in f1_props or "vitamin_c" in f2_props
+
+    if has_iron and has_vit_c:
+         # Check if we haven't already added a similar pro
+         if not any("Vitamin C" in p and "Iron" in p for p in pros):
+            score += 1.5
+            pros.append("Scientifically proven: Vitamin C enhances Iron absorption")
+
+    # Protein + Carbs
+    has_protein = "protein" in f1_props or "protein" in f2_props
+    has_carbs = "carbs" in f1_props or "carbs" in f2_props
+
+    if has_protein and has_carbs:
+        if not any("Protein" in p and "Carbohydrates" in p for p in pros):
+            score += 1.0
+            pros.append("Balanced nutrition: Protein + Carbohydrates for sustained energy")
+
+    # --- 8. CATEGORY-BASED ANALYSIS ---
+    if f1["category"] == f2["category"]:
+        if f1["category"] == "fruit":
+            score += 0.5
+            pros.append("Fruits complement each other well nutritionally")
+        elif f1["category"] == "vegetable":
+            score += 0.5
+            pros.append("Vegetables provide complementary nutrients and fiber")
+        elif f1["category"] == "protein":
+            score -= 0.5
+            cons.append("Multiple proteins may compete for absorption")
+        elif f1["category"] == "grain":
+            score -= 0.5
+            cons.append("Multiple grains may cause digestive issues")
+
+    # --- FINAL SCORING ---
+    score = max(1.0, min(10.0, score))
+
+    if score >= 8.5:
+        level = "Excellent Compatibility"
+    elif score >= 7.5:
+        level = "Very Good Compatibility"
+    elif score >= 6.5:
+        level = "Good Compatibility"
+    elif score >= 5.5:
+        level = "Moderate Compatibility"
+    elif score >= 4.5:
+        level = "Fair Compatibility"
+    elif score >= 3.5:
+        level = "Low Compatibility"
+    else:
+        level = "Poor Compatibility"
+
+    # Defaults
+    if not pros:
+        pros.append("Foods can be consumed together without major conflicts")
+    if not cons:
+        cons.append("No significant compatibility issues identified")
+
+    return {
+        "level": level,
+        "score": round(score, 1),
+        "pros": pros[:3],
+        "cons": cons[:3]
+    }
+
+
+def reference_extract_medicine_names(medicine_db, text):
+    found_medicines = []
+    lower_text = text.lower()
+    for med in medicine_db:
+        if med in lower_text:
+            found_medicines.append(med)
+        elif len(med) > 6 and med[:-2] in lower_text:
+            found_medicines.append(med)
+    return list(set(found_medicines))
+
+
+def reference_similar(foods, food, limit):
+    query = {p.lower() for p in food["properties"]}
+    scored = []
+    for row, other in enumerate(foods):
+        if other["name"].lower() == food["name"].lower():
+            continue
+        props = {p.lower() for p in other["properties"]}
+        union = len(query | props)
+        scored.append((-(len(query & props) / union if union else 0.0), row))
+    scored.sort()
+    return [(foods[row]["id"], round(-score, 3)) for score, row in scored[:limit]]
+
+
+@contextmanager
+def swapped(module, name, value):
+    """Point a module-level table at synthetic data for the duration of a benchmark"""
+    original = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+@contextmanager
+def swapped_catalog(foods):
+    """Swap in a synthetic catalog together with the id and name indexes built on it"""
+    rows, rows_by_name = backend.index_foods(foods)
+    with swapped(backend, "FOODS", foods), swapped(backend, "FOOD_ROWS", rows), \
+            swapped(backend, "FOOD_ROWS_BY_NAME", rows_by_name):
+        yield
+
+
+# --- Timing ---------------------------------------------------------------
+
+def measure(fn, number, repeat=5, max_seconds=5.0):
+    """Per-call timings in microseconds over up to `repeat` batches of `number` calls"""
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number * 1e6)
+        if time.perf_counter() > deadline:
+            break
+    return {
+        "calls": number * len(timings),
+        "min_us": round(min(timings), 3),
+        "median_us": round(statistics.median(timings), 3),
+    }
+
+
+def calls_for(size, budget):
+    """Scale the call count down for big catalogs so each case stays around a second"""
+    return max(1, budget // max(1, size))
+
+
+def run_size(size, medicines, seed):
+    rng = random.Random(seed)
+    foods = synthetic_foods(size, seed)
+    results = []
+
+    def record(name, timing):
+        timing.update({"benchmark": name, "size": size})
+        results.append(timing)
+        print(f"  {name:<28} {timing['median_us']:>14,.1f} us/call  ({timing['calls']} calls)")
+
+    print(f"\n{size:,} foods")
+    pairs = [(rng.choice(foods), rng.choice(foods), rng.choice(AGES), rng.choice(SEASONS), rng.choice(TIMES))
+             for _ in range(1000)]
+    pair_iter = cycle(pairs)
+    record("analyze_compatibility", measure(lambda: engine.analyze_compatibility(*next(pair_iter)), 1000))
+
+    profiles = [(rng.choice(AGES), rng.choice(SEASONS), rng.choice(TIMES), rng.choice(DISEASES)) for _ in range(50)]
+    profile_iter = cycle(profiles)
+    with swapped_catalog(foods):
+        record("generate_suggestions",
+               measure(lambda: backend.generate_suggestions(*next(profile_iter)), calls_for(size, 200000)))
+
+        ids = [rng.randint(1, size) for _ in range(100)]
+        id_iter = cycle(ids)
+        record("get_food_by_id", measure(lambda: backend.get_food_by_id(next(id_iter)), calls_for(size, 2000000)))
+
+    food_df = pd.DataFrame(foods)
+    search = SmartSearchModule(food_df)
+    queries = [rng.choice(foods)["name"].lower()[:rng.randint(3, 8)] for _ in range(50)] + ["no such food"]
+    query_iter = cycle(queries)
+    record("SmartSearchModule.search", measure(lambda: search.search(next(query_iter)), calls_for(size, 200000)))
+
+    index = PropertySimilarityIndex(foods)
+    targets = [rng.choice(foods) for _ in range(50)]
+    target_iter = cycle(targets)
+    record("similar_foods", measure(lambda: index.similar(food=next(target_iter)), calls_for(size, 2000000)))
+
+    # The analytics grid grows with the square of the catalog
+    if size <= 10000:
+        record("compatibility_analytics", measure(lambda: analyze(foods, 40, "summer", "day"), 1, repeat=3))
+
+    return results, foods
+
+
+def run_medicines(medicines, seed):
+    text = synthetic_prescription(medicines, seed=seed)
+    results = []
+    with swapped(backend, "MEDICINE_DB", medicines):
+        timing = measure(lambda: backend.extract_medicine_names(text), 5)
+    timing.update({"benchmark": "extract_medicine_names", "size": len(medicines)})
+    results.append(timing)
+    print(f"\n{len(medicines):,} medicines")
+    print(f"  {'extract_medicine_names':<28} {timing['median_us']:>14,.1f} us/call  ({timing['calls']} calls)")
+
+    # Dosage extraction should scale linearly with the length of the text
+    names = dosage_names(medicines, 50)
+    for n_lines in (10, 100, 1000, 10000):
+        text, expected = synthetic_dosage_prescription(names, n_lines, seed)
+        found = sorted(expected)
+        timing = measure(lambda: extract_dosages(text, found), max(1, 20000 // n_lines))
+        timing.update({"benchmark": "extract_dosages", "size": n_lines})
+        results.append(timing)
+        print(f"  {'extract_dosages':<28} {timing['median_us']:>14,.1f} us/call  "
+              f"({n_lines:,} lines, {timing['median_us'] / n_lines:.2f} us/line)")
+
+    # OCR noise can produce long digit runs; each must be scanned once, not
+    # once per starting position
+    for n_digits in (10000, 40000):
+        text = "Tab Paracetamol " + "1" * n_digits
+        timing = measure(lambda: extract_dosages(text, ["paracetamol"]), 5)
+        timing.update({"benchmark": "extract_dosages_digit_run", "size": n_digits})
+        results.append(timing)
+        print(f"  {'extract_dosages (digit run)':<28} {timing['median_us']:>14,.1f} us/call  "
+              f"({n_digits:,} digits, {timing['median_us'] / n_digits:.3f} us/digit)")
+    return results
+
+
+# --- Differential check ---------------------------------------------------
+
+def differential_check(foods, medicines, seed):
+    """Assert that every optimized path returns exactly what the reference does"""
+    rng = random.Random(seed)
+    checked = {}
+
+    with swapped_catalog(foods):
+        ids = [rng.randint(0, len(foods) + 5) for _ in range(200)]
+        for food_id in ids:
+            assert backend.get_food_by_id(food_id) == reference_get_food_by_id(foods, food_id), food_id
+        checked["get_food_by_id"] = len(ids)
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_snapshot(foods, directory)
+        catalog = SharedCatalog.attach(directory)
+        for food_id in ids:
+            shared = catalog.get(food_id)
+            expected = reference_get_food_by_id(foods, food_id)
+            assert (dict(shared) if shared else None) == expected, food_id
+        checked["SharedCatalog.get"] = len(ids)
+        names = [rng.choice(foods)["name"].upper() for _ in range(100)] + ["no such food"]
+        for name in names:
+            shared = catalog.get_by_name(name)
+            expected = reference_get_food_by_name(foods, name)
+            assert (dict(shared) if shared else None) == expected, name
+        checked["SharedCatalog.get_by_name"] = len(names)
+        del catalog
+
+    index = PropertySimilarityIndex(foods)
+    targets = [rng.choice(foods) for _ in range(20)]
+    for food in targets:
+        got = [(f["id"], f["similarity"]) for f in index.similar(food=food, limit=10)]
+        expected = reference_similar(foods, food, 10)
+        # Equal scores may tie-break differently; the scores must still line up
+        assert [s for _, s in got] == [s for _, s in expected], food["name"]
+    checked["PropertySimilarityIndex.similar"] = len(targets)
+
+    # Upserting chunks (replaced rows plus appends, new properties included)
+    # must leave the index answering like one built from the final catalog
+    live = list(foods[:len(foods) // 2])
+    index = PropertySimilarityIndex(live)
+    next_id = max(f["id"] for f in foods) + 1
+    for chunk in range(20):
+        rows = rng.sample(range(len(live)), min(len(live), 10))
+        replacements = []
+        for row in rows:
+            food = dict(rng.choice(foods), id=live[row]["id"])
+            food["properties"] = rng.sample(food["properties"], max(1, len(food["properties"]) // 2))
+            if rng.random() < 0.3:
+                food["properties"].append(f"Upserted property {rng.randrange(100)}")
+            replacements.append(food)
+        start = len(live)
+        appended = [dict(f, id=next_id + i) for i, f in enumerate(foods[start:start + 15])]
+        next_id += len(appended)
+        for row, food in zip(rows, replacements):
+            live[row] = food
+        live.extend(appended)
+        index.upsert(rows + list(range(start, len(live))), replacements + appended)
+    rebuilt = PropertySimilarityIndex(list(live))
+    targets = [rng.choice(live) for _ in range(20)]
+    for metric in ("jaccard", "weighted"):
+        for food in targets:
+            got = index.similar(food=food, limit=10, metric=metric)
+            expected = rebuilt.similar(food=food, limit=10, metric=metric)
+            assert [f["similarity"] for f in got] == [f["similarity"] for f in expected], (metric, food["name"])
+    # Bit positions are interned in a different order; compare by property
+    order = [index.property_ids[prop] for prop in rebuilt.property_ids]
+    assert np.allclose(index.weights[order], rebuilt.weights)
+    assert np.array_equal(index.sizes, rebuilt.sizes)
+    assert np.array_equal(index.names, rebuilt.names)
+    checked["PropertySimilarityIndex.upsert"] = 2 * len(targets)
+
+    with swapped(backend, "MEDICINE_DB", medicines):
+        for i in range(5):
+            text = synthetic_prescription(medicines, seed=seed + i)
+            got = sorted(backend.extract_medicine_names(text))
+            assert got == sorted(reference_extract_medicine_names(medicines, text)), text
+    checked["extract_medicine_names"] = 5
+
+    # The rule sections together must reproduce the single-function engine
+    sample = rng.sample(foods, min(len(foods), 30))
+    contexts = [(age, season, time_of_day) for age in AGES for season in SEASONS for time_of_day in TIMES + ["any"]]
+    for food1 in sample:
+        for food2 in sample:
+            for age, season, time_of_day in contexts:
+                got = engine.analyze_compatibility(food1, food2, age, season, time_of_day)
+                assert got == reference_analyze_compatibility(food1, food2, age, season, time_of_day), \
+                    (food1["name"], food2["name"], age, season, time_of_day)
+    checked["analyze_compatibility"] = len(sample) ** 2 * len(contexts)
+
+    # A live session must match a fresh call after any sequence of updates
+    session = CompatibilitySession(engine)
+    steps = 2000
+    for _ in range(steps):
+        changes = {}
+        if rng.random() < 0.3 or not session.ready:
+            changes["food1"] = rng.choice(sample)
+        if rng.random() < 0.3 or not session.ready:
+            changes["food2"] = rng.choice(sample)
+        if rng.random() < 0.3:
+            changes["age"] = rng.randint(5, 80)
+        if rng.random() < 0.3:
+            changes["season"] = rng.choice(SEASONS)
+        if rng.random() < 0.3:
+            changes["time"] = rng.choice(TIMES + ["any"])
+        session.update(**changes)
+        expected = engine.analyze_compatibility(session.food1, session.food2, session.age, session.season, session.time)
+        assert session.result() == expected, changes
+    checked["CompatibilitySession.result"] = steps
+
+    # Every vectorized rule section must give each pair the engine's score change
+    sample = rng.sample(foods, min(len(foods), 200))
+    classes = FoodClasses(sample)
+    rows = [classes.row(food) for food in sample]
+    pairs = [(rng.randrange(len(sample)), rng.randrange(len(sample))) for _ in range(500)]
+    for age in CONTEXT_AGES:
+        for season in CONTEXT_SEASONS:
+            for time_of_day in CONTEXT_TIMES:
+                grid = section_grid(classes, slice(0, classes.n), age, season, time_of_day)
+                for i, j in pairs:
+                    facts1, facts2 = engine.food_facts(sample[i]), engine.food_facts(sample[j])
+                    for name, _, rule in engine.RULE_SECTIONS:
+                        expected = rule(engine, facts1, facts2, age, season, time_of_day, [], [])
+                        assert grid[name][rows[i], rows[j]] == expected, (name, sample[i]["name"], sample[j]["name"])
+    checked["compatibility_analytics sections"] = len(pairs) * len(CONTEXT_AGES) * len(CONTEXT_SEASONS) * len(CONTEXT_TIMES)
+
+    names = dosage_names(medicines, 50)
+    for i in range(5):
+        text, expected = synthetic_dosage_prescription(names, 200, seed + i)
+        dosages = extract_dosages(text, sorted(expected))
+        for name, (strength, per_day, days) in expected.items():
+            dosage = dosages[name]
+            got = (dosage["strength"]["text"], dosage["frequency"]["times_per_day"], dosage["duration"]["days"])
+            assert got == (strength, per_day, days), (name, got)
+    checked["extract_dosages"] = 5
+
+    for name, count in checked.items():
+        print(f"  {name:<32} matches reference ({count} cases)")
+    return checked
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as fh:
+        baseline = {(r["benchmark"], r["size"]): r for r in json.load(fh)["results"]}
+    print(f"\nCompared with {baseline_path}")
+    for result in results:
+        before = baseline.get((result["benchmark"], result["size"]))
+        if not before:
+            continue
+        ratio = before["median_us"] / result["median_us"] if result["median_us"] else float("inf")
+        print(f"  {result['benchmark']:<28} {result['size']:>9,}  {ratio:6.2f}x "
+              f"({before['median_us']:,.1f} -> {result['median_us']:,.1f} us)")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run NutriSync micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--medicines", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = []
+    medicines = synthetic_medicines(args.medicines, args.seed)
+    for size in args.sizes:
+        size_results, foods = run_size(size, medicines, args.seed)
+        results.extend(size_results)
+    results.extend(run_medicines(medicines, args.seed))
+
+    print("\nDifferential check")
+    checked = differential_check(synthetic_foods(min(args.sizes), args.seed), medicines, args.seed)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "results": results,
+        "differential": checked,
+    }
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
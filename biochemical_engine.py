@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 
 class SmartSearchModule:
@@ -24,8 +23,20 @@ class SmartSearchModule:
 
 class BioChemicalEngine:
     def __init__(self, csv_path="food.csv"):
+        # The database is only needed to resolve food names, so it is loaded on
+        # first use; callers that pass food records never pay for parsing it
+        self.csv_path = csv_path
+        self._food_df = None
+        self._search_module = None
+        # Optional metrics.SectionProbe; records which rule sections fire
+        self.probe = None
+
+    def _load(self):
+        # pandas is heavy; workers that never resolve a name never import it
+        import pandas as pd
+
         try:
-            self.food_df = pd.read_csv(csv_path)
+            self._food_df = pd.read_csv(self.csv_path)
             # Ensure properties are lists
             def parse_properties(prop_str):
                 if pd.isna(prop_str):
@@ -34,13 +45,25 @@ class BioChemicalEngine:
                     return [p.strip().lower() for p in prop_str.split(',')]
                 return []
             
-            self.food_df['properties'] = self.food_df['properties'].apply(parse_properties)
-            self.search_module = SmartSearchModule(self.food_df)
-            print("Bio-Chemical Engine Loaded. Database size:", len(self.food_df))
+            self._food_df['properties'] = self._food_df['properties'].apply(parse_properties)
+            self._search_module = SmartSearchModule(self._food_df)
+            print("Bio-Chemical Engine Loaded. Database size:", len(self._food_df))
         except Exception as e:
             print(f"Error loading Food Database: {e}")
-            self.food_df = pd.DataFrame()
-            self.search_module = None
+            self._food_df = pd.DataFrame()
+            self._search_module = None
+
+    @property
+    def food_df(self):
+        if self._food_df is None:
+            self._load()
+        return self._food_df
+
+    @property
+    def search_module(self):
+        if self._food_df is None:
+            self._load()
+        return self._search_module
 
     def get_food_details(self, food_name):
         if self.search_module:
@@ -70,30 +93,61 @@ class BioChemicalEngine:
                 "cons": ["One or both foods not found in Bio-Chemical Database"]
             }
 
-        # Convert Series to dict if necessary for easier access, or just ensure dict access works
-        # pandas Series supports ['key'] access similar to dict
-        
-        food1_name = f1["name"].lower()
-        food2_name = f2["name"].lower()
-        
-        # Ensure properties are sets for O(1) lookups
-        f1_props = set(f1['properties'])
-        f2_props = set(f2['properties'])
+        facts1 = self.food_facts(f1)
+        facts2 = self.food_facts(f2)
 
         score = 5.0  # Base score out of 10
         pros = []
         cons = []
-
+        run = self.probe.begin(pros, cons) if self.probe else None
+
+        for name, _, rule in self.RULE_SECTIONS:
+            score += rule(self, facts1, facts2, age, season, time, pros, cons)
+            if run:
+                run.section(name)
+
+        return self.finish(score, pros, cons)
+
+    @staticmethod
+    def food_facts(food):
+        """The parts of a food record the rules look at: (lowercase name, property set, category)"""
+        # Properties are sets for O(1) lookups
+        return food["name"].lower(), set(food["properties"]), food["category"]
+
+    # Pairings the nutritional and traditional sections look for
+    EXCELLENT_PAIRS = [
+        ({"potassium", "energy", "digestive"}, {"calcium", "protein", "hydration"}),  # Banana + Milk
+        ({"carbs", "energy", "fiber"}, {"omega_3", "protein", "vitamin_d"}),  # Rice + Fish
+        ({"iron", "vitamin_k", "folate"}, {"vitamin_c", "fiber", "antioxidants"}),  # Spinach + Tomato
+        ({"protein", "iron", "b_vitamins"}, {"vitamin_c", "fiber", "beta_carotene"}),  # Chicken + Carrot
+    ]
+    GOOD_PAIRS = [
+        ({"vitamin_c", "fiber", "antioxidants"}, {"vitamin_c", "fiber", "antioxidants"}),  # Fruits together
+        ({"protein", "iron"}, {"vitamin_c"}),  # Protein + Vitamin C source
+        ({"carbs", "fiber"}, {"protein"}),  # Carbs + Protein
+    ]
+    TRADITIONAL_GOOD = [
+        ("milk", "banana"), ("rice", "fish"), ("lentils", "rice"),
+        ("bread", "cheese"), ("spinach", "potato"), ("ginger", "honey")
+    ]
+    TRADITIONAL_BAD = [
+        ("milk", "fish"), ("milk", "sour fruits"), ("honey", "heating foods"),
+        ("spinach", "potato"), ("coffee", "milk")
+    ]
+
+    # Each rule section below appends its findings to pros/cons and returns
+    # its change to the score. Sections only see the inputs listed for them
+    # in RULE_SECTIONS, so a caller holding the previous results can re-run
+    # just the sections an input change affects.
+
+    def _nutritional(self, f1, f2, age, season, time, pros, cons):
         # --- 1. NUTRITIONAL COMPLEMENTARITY ANALYSIS ---
+        _, f1_props, _ = f1
+        _, f2_props, _ = f2
+        score = 0.0
+
         # Excellent pairings
-        excellent_pairs = [
-            ({"potassium", "energy", "digestive"}, {"calcium", "protein", "hydration"}),  # Banana + Milk
-            ({"carbs", "energy", "fiber"}, {"omega_3", "protein", "vitamin_d"}),  # Rice + Fish
-            ({"iron", "vitamin_k", "folate"}, {"vitamin_c", "fiber", "antioxidants"}),  # Spinach + Tomato
-            ({"protein", "iron", "b_vitamins"}, {"vitamin_c", "fiber", "beta_carotene"}),  # Chicken + Carrot
-        ]
-
-        for nutrients_a, nutrients_b in excellent_pairs:
+        for nutrients_a, nutrients_b in self.EXCELLENT_PAIRS:
             if (nutrients_a.issubset(f1_props) and nutrients_b.issubset(f2_props)) or \
                (nutrients_a.issubset(f2_props) and nutrients_b.issubset(f1_props)):
                 score += 2.5
@@ -101,13 +155,7 @@ class BioChemicalEngine:
                 break
 
         # Good pairings
-        good_pairs = [
-            ({"vitamin_c", "fiber", "antioxidants"}, {"vitamin_c", "fiber", "antioxidants"}),  # Fruits together
-            ({"protein", "iron"}, {"vitamin_c"}),  # Protein + Vitamin C source
-            ({"carbs", "fiber"}, {"protein"}),  # Carbs + Protein
-        ]
-
-        for nutrients_a, nutrients_b in good_pairs:
+        for nutrients_a, nutrients_b in self.GOOD_PAIRS:
             # Check if pair matches (avoiding duplicate credit if already matched excellent)
             if (nutrients_a.issubset(f1_props) and nutrients_b.issubset(f2_props)) or \
                (nutrients_a.issubset(f2_props) and nutrients_b.issubset(f1_props)):
@@ -117,7 +165,14 @@ class BioChemicalEngine:
                     pros.append("Good nutritional balance - complementary nutrients")
                 break
 
+        return score
+
+    def _digestive(self, f1, f2, age, season, time, pros, cons):
         # --- 2. DIGESTIVE COMPATIBILITY ANALYSIS ---
+        food1_name, f1_props, _ = f1
+        food2_name, f2_props, _ = f2
+        score = 0.0
+
         if "heavy" in f1_props and "heavy" in f2_props:
             score -= 2.0
             cons.append("Both foods are heavy and may cause digestive discomfort")
@@ -137,32 +192,36 @@ class BioChemicalEngine:
             score -= 1.5
             cons.append("Too much heating foods in summer can cause discomfort")
 
-        # --- 3. TRADITIONAL WISDOM ANALYSIS ---
-        traditional_good = [
-            ("milk", "banana"), ("rice", "fish"), ("lentils", "rice"),
-            ("bread", "cheese"), ("spinach", "potato"), ("ginger", "honey")
-        ]
+        return score
 
-        traditional_bad = [
-            ("milk", "fish"), ("milk", "sour fruits"), ("honey", "heating foods"),
-            ("spinach", "potato"), ("coffee", "milk")
-        ]
+    def _traditional(self, f1, f2, age, season, time, pros, cons):
+        # --- 3. TRADITIONAL WISDOM ANALYSIS ---
+        food1_name = f1[0]
+        food2_name = f2[0]
+        score = 0.0
 
-        for food_a, food_b in traditional_good:
+        for food_a, food_b in self.TRADITIONAL_GOOD:
             if (food1_name == food_a and food2_name == food_b) or \
                (food1_name == food_b and food2_name == food_a):
                 score += 2.0
                 pros.append("Traditional combination proven effective in many cultures")
                 break
 
-        for food_a, food_b in traditional_bad:
+        for food_a, food_b in self.TRADITIONAL_BAD:
             if (food1_name == food_a and food2_name == food_b) or \
                (food1_name == food_b and food2_name == food_a):
                 score -= 2.0
                 cons.append("Traditionally considered incompatible in many culinary traditions")
                 break
 
+        return score
+
+    def _age(self, f1, f2, age, season, time, pros, cons):
         # --- 4. AGE-APPROPRIATE ANALYSIS ---
+        f1_props = f1[1]
+        f2_props = f2[1]
+        score = 0.0
+
         if age < 18:
             if ("calcium" in f1_props or "calcium" in f2_props) and \
                ("protein" in f1_props or "protein" in f2_props):
@@ -182,7 +241,14 @@ class BioChemicalEngine:
                 score += 0.5
                 pros.append("Good nutrient diversity for adult health")
 
+        return score
+
+    def _seasonal(self, f1, f2, age, season, time, pros, cons):
         # --- 5. SEASONAL APPROPRIATENESS ---
+        f1_props = f1[1]
+        f2_props = f2[1]
+        score = 0.0
+
         if season == "summer":
             cooling_foods = ["cooling", "hydration"]
             
@@ -219,7 +285,14 @@ class BioChemicalEngine:
                 score -= 1.0
                 cons.append("May increase mucus formation during humid rainy season")
 
+        return score
+
+    def _time_of_day(self, f1, f2, age, season, time, pros, cons):
         # --- 6. TIME OF DAY CONSIDERATIONS ---
+        f1_props = f1[1]
+        f2_props = f2[1]
+        score = 0.0
+
         if time == "day":
             if ("energy" in f1_props or "energy" in f2_props) and \
                ("light" in f1_props or "light" in f2_props):
@@ -246,8 +319,16 @@ class BioChemicalEngine:
                 score -= 1.0
                 cons.append("May interfere with sleep quality")
 
+        return score
+
+    def _scientific(self, f1, f2, age, season, time, pros, cons):
         # --- 7. SCIENTIFIC EVIDENCE-BASED RULES ---
+        f1_props = f1[1]
+        f2_props = f2[1]
+        score = 0.0
+
         # Vitamin C + Iron (Fixing potential duplication if handled in good pairs)
+        # The duplicate checks below only match this section's own messages
         has_iron = "iron" in f1_props or "iron" in f2_props
         has_vit_c = "vitamin_c" in f1_props or "vitamin_c" in f2_props
         
@@ -266,21 +347,45 @@ class BioChemicalEngine:
                 score += 1.0
                 pros.append("Balanced nutrition: Protein + Carbohydrates for sustained energy")
 
+        return score
+
+    def _category(self, f1, f2, age, season, time, pros, cons):
         # --- 8. CATEGORY-BASED ANALYSIS ---
-        if f1["category"] == f2["category"]:
-            if f1["category"] == "fruit":
+        f1_category = f1[2]
+        f2_category = f2[2]
+        score = 0.0
+
+        if f1_category == f2_category:
+            if f1_category == "fruit":
                 score += 0.5
                 pros.append("Fruits complement each other well nutritionally")
-            elif f1["category"] == "vegetable":
+            elif f1_category == "vegetable":
                 score += 0.5
                 pros.append("Vegetables provide complementary nutrients and fiber")
-            elif f1["category"] == "protein":
+            elif f1_category == "protein":
                 score -= 0.5
                 cons.append("Multiple proteins may compete for absorption")
-            elif f1["category"] == "grain":
+            elif f1_category == "grain":
                 score -= 0.5
                 cons.append("Multiple grains may cause digestive issues")
 
+        return score
+
+    # (section name, inputs it depends on besides the two foods, rule), in scoring order
+    RULE_SECTIONS = (
+        ("nutritional", (), _nutritional),
+        ("digestive", ("season",), _digestive),
+        ("traditional", (), _traditional),
+        ("age", ("age",), _age),
+        ("seasonal", ("season",), _seasonal),
+        ("time_of_day", ("time", "age"), _time_of_day),
+        ("scientific", (), _scientific),
+        ("category", (), _category),
+    )
+
+    @staticmethod
+    def finish(score, pros, cons):
+        """Clamp the summed section scores and build the result dict"""
         # --- FINAL SCORING ---
         score = max(1.0, min(10.0, score))
 
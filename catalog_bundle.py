@@ -0,0 +1,215 @@
+"""Versioned catalog bundles and deltas for offline clients.
+
+A catalog version is a hash of its rows, so every worker serving the same
+catalog reports the same version without coordinating. Each published
+version keeps its per-row hashes in a short history; a client that sends
+the version it already holds gets back only the rows that changed since
+then. Versions that have dropped out of the history (or that this process
+never saw) fall back to a full bundle.
+
+Row hashes and the score table are arrays, so a shared snapshot can carry
+them (catalog_arrays) and workers publish it without hashing or scoring.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from compatibility_analytics import CONTEXT_AGES, CONTEXT_SEASONS, CONTEXT_TIMES, pair_scores
+from food_classes import FoodClasses
+
+# Bracket names for the score table's representative ages (CONTEXT_AGES)
+AGE_BRACKETS = ("under_18", "18_to_30", "31_to_50", "over_50")
+LEVEL_THRESHOLDS = [
+    [8.5, "Excellent Compatibility"],
+    [7.5, "Very Good Compatibility"],
+    [6.5, "Good Compatibility"],
+    [5.5, "Moderate Compatibility"],
+    [4.5, "Fair Compatibility"],
+    [3.5, "Low Compatibility"],
+    [0.0, "Poor Compatibility"],
+]
+# The score table grows with the square of the catalog, so it is only
+# offered for catalogs small enough to precompute quickly
+MAX_SCORE_TABLE_FOODS = 150
+HISTORY_SIZE = 32
+
+
+def _row(food):
+    return [int(food["id"]), food["name"], food["category"], food.get("season", "all"), list(food["properties"])]
+
+
+def _row_hash(row):
+    digest = hashlib.blake2b(json.dumps(row, separators=(",", ":")).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def row_hashes(foods):
+    return np.array([_row_hash(_row(food)) for food in foods], dtype=np.uint64)
+
+
+def score_table_array(foods):
+    """Scores in tenths, one row per context (CONTEXT_AGES x CONTEXT_SEASONS x CONTEXT_TIMES)
+    and one column per upper-triangle pair (0,0), (0,1) ... (0,n-1), (1,1) ..."""
+    classes = FoodClasses(foods)
+    rows = classes.food_rows
+    first, second = np.triu_indices(len(foods))
+    first, second = rows[first], rows[second]
+    table = np.empty((len(CONTEXT_AGES) * len(CONTEXT_SEASONS) * len(CONTEXT_TIMES), len(first)), dtype=np.int16)
+    k = 0
+    for age in CONTEXT_AGES:
+        for season in CONTEXT_SEASONS:
+            for time in CONTEXT_TIMES:
+                table[k] = np.rint(pair_scores(classes, age, season, time)[first, second] * 10)
+                k += 1
+    return table
+
+
+def catalog_arrays(foods):
+    """Arrays for build_snapshot(arrays=...) so workers can publish without recomputing them"""
+    arrays = {"row_hashes": row_hashes(foods)}
+    if len(foods) <= MAX_SCORE_TABLE_FOODS:
+        arrays["score_table"] = score_table_array(foods)
+    return arrays
+
+
+class CatalogPublisher:
+    def __init__(self):
+        self.history = OrderedDict()  # version -> (sorted ids, their row hashes)
+        self.version = None
+        self.foods = []
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._score_table = None
+        self._bundles = {}
+        # Optional metrics.record_cache; counts bundle cache hits and misses
+        self.record_cache = None
+
+    @property
+    def has_score_table(self):
+        return len(self.foods) <= MAX_SCORE_TABLE_FOODS
+
+    def publish(self, foods, arrays=None):
+        """Register the current catalog and return its version.
+
+        `arrays` are the arrays of a shared snapshot (ids, id_order and
+        those from catalog_arrays); they are used in place instead of
+        hashing and scoring the rows again.
+        """
+        arrays = arrays or {}
+        if "row_hashes" in arrays:
+            ids, hashes, order = arrays["ids"], arrays["row_hashes"], arrays["id_order"]
+        else:
+            ids = np.array([int(food["id"]) for food in foods], dtype=np.int64)
+            hashes = row_hashes(foods)
+            order = np.argsort(ids, kind="stable")
+        sorted_ids, sorted_hashes = ids[order], hashes[order]
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(sorted_ids.astype("<i8").tobytes())
+        digest.update(sorted_hashes.astype("<u8").tobytes())
+        version = digest.hexdigest()
+
+        # Keep the rows this version was hashed from; a bulk import keeps
+        # changing the live list until it publishes again
+        self.foods = list(foods) if isinstance(foods, list) else foods
+        self._ids, self._hashes = ids, hashes
+        self._score_table = arrays.get("score_table")
+        if version != self.version:
+            self._bundles.clear()
+        self.version = version
+        self.history[version] = (sorted_ids, sorted_hashes)
+        self.history.move_to_end(version)
+        while len(self.history) > HISTORY_SIZE:
+            self.history.popitem(last=False)
+        return version
+
+    def bundle(self, include_scores=False):
+        """Full catalog with properties, categories and seasons interned to indexes"""
+        key = bool(include_scores)
+        if self.record_cache:
+            hit = key in self._bundles
+            self.record_cache("catalog_bundle", int(hit), int(not hit))
+        if key in self._bundles:
+            return self._bundles[key]
+
+        properties, categories, seasons = {}, {}, {}
+        rows = []
+        for food in self.foods:
+            food_id, name, category, season, props = _row(food)
+            rows.append([
+                food_id,
+                name,
+                categories.setdefault(category, len(categories)),
+                seasons.setdefault(season, len(seasons)),
+                [properties.setdefault(p, len(properties)) for p in props],
+            ])
+
+        bundle = {
+            "version": self.version,
+            "columns": ["id", "name", "category", "season", "properties"],
+            "categories": list(categories),
+            "seasons": list(seasons),
+            "properties": list(properties),
+            "rows": rows,
+        }
+        if include_scores:
+            if not self.has_score_table:
+                raise ValueError(f"The score table is only offered for catalogs of up to {MAX_SCORE_TABLE_FOODS} foods")
+            bundle["scores"] = self.score_table()
+        self._bundles[key] = bundle
+        return bundle
+
+    def score_table(self):
+        """Compatibility scores for every food pair under every context branch.
+
+        Scores are stored as integers in tenths (the engine rounds to one
+        decimal) for the upper triangle of the pair matrix in row order:
+        (0,0), (0,1) ... (0,n-1), (1,1), (1,2) ... Look up a context with
+        the age bucket, season and time keys.
+        """
+        table = self._score_table
+        if table is None:
+            table = score_table_array(list(self.foods))
+        keys = [f"{age}|{season}|{time}"
+                for age in CONTEXT_AGES for season in CONTEXT_SEASONS for time in CONTEXT_TIMES]
+        tables = {key: values.tolist() for key, values in zip(keys, table)}
+        return {
+            "scale": 10,
+            "ages": dict(zip(AGE_BRACKETS, CONTEXT_AGES)),
+            "seasons": list(CONTEXT_SEASONS),
+            "times": list(CONTEXT_TIMES),
+            "levels": LEVEL_THRESHOLDS,
+            "tables": tables,
+        }
+
+    def delta(self, since):
+        """Rows added or changed and ids removed since version `since`.
+
+        Upserted rows spell out category, season and properties instead of
+        using bundle indexes, since the interned tables may have shifted.
+        """
+        if since == self.version:
+            return {"version": self.version, "base": since, "full": False, "upserts": [], "deletes": []}
+
+        base = self.history.get(since)
+        if base is None:
+            return {"version": self.version, "base": since, "full": True, "bundle": self.bundle()}
+
+        base_ids, base_hashes = base
+        current_ids = self.history[self.version][0]
+        if len(base_ids):
+            pos = np.minimum(np.searchsorted(base_ids, self._ids), len(base_ids) - 1)
+            unchanged = (base_ids[pos] == self._ids) & (base_hashes[pos] == self._hashes)
+        else:
+            unchanged = np.zeros(len(self._ids), dtype=bool)
+        upserts = [_row(self.foods[int(row)]) for row in np.flatnonzero(~unchanged)]
+        deletes = np.unique(base_ids[~np.isin(base_ids, current_ids)]).tolist()
+        return {
+            "version": self.version,
+            "base": since,
+            "full": False,
+            "columns": ["id", "name", "category", "season", "properties"],
+            "upserts": upserts,
+            "deletes": deletes,
+        }
@@ -0,0 +1,426 @@
+"""Streaming bulk import of foods from CSV or NDJSON.
+
+Input is fed in arbitrary text pieces (file reads or request body chunks)
+and split into records as it arrives; only the current partial line and
+one chunk of validated rows are ever held. Each full chunk is handed to
+an `apply` callback that updates the catalog and its indexes in place, so
+import memory does not depend on the size of the input.
+
+    python catalog_import.py new_foods.ndjson                 # merge into food.csv
+    python catalog_import.py new_foods.csv --dry-run          # validate only
+    python catalog_import.py big.ndjson --url http://localhost:8002 --token $NUTRISYNC_ADMIN_TOKEN
+
+Rows are upserts: an id already in the catalog is replaced, a new id is
+appended. A local merge stages the validated rows in a temporary on-disk
+SQLite table keyed by id, then streams food.csv once: replaced rows are
+rewritten in place, all other rows are copied as they are, and new rows
+follow at the end. Invalid rows are counted and reported with their line
+number and never stop the import.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from itertools import count, islice
+
+CATEGORIES = {"beverage", "dairy", "fruit", "grain", "legume", "nut", "protein", "spice", "sweetener", "vegetable"}
+SEASONS = {"all", "fall", "spring", "summer", "winter", "rainy", "tropical"}
+PROPERTY_PATTERN = re.compile(r"[a-z][a-z0-9_]*\Z")
+MAX_PROPERTIES = 64
+MAX_NAME_LENGTH = 100
+COLUMNS = ["id", "name", "category", "season", "properties"]
+
+DEFAULT_CHUNK_SIZE = 1000
+# Existing catalog rows looked up in the staged import per query
+MERGE_BATCH_SIZE = 1000
+# Longest line (or multi-line quoted CSV record) held while waiting for its end
+MAX_RECORD_LENGTH = 1 << 16
+# Enough examples to fix a broken export without echoing a million bad rows
+MAX_REPORTED_ERRORS = 50
+
+
+class RowError(ValueError):
+    pass
+
+
+def validate_row(raw, categories=CATEGORIES):
+    """Check one parsed record and return it as a catalog food dict.
+
+    `categories=None` accepts any non-empty category.
+    """
+    if not isinstance(raw, dict):
+        raise RowError("Row is not an object")
+
+    food_id = raw.get("id")
+    if isinstance(food_id, str):
+        food_id = food_id.strip()
+        if not food_id.isdigit():
+            raise RowError(f"id must be a positive integer, got {food_id!r}")
+        food_id = int(food_id)
+    elif isinstance(food_id, float) and food_id.is_integer():
+        food_id = int(food_id)
+    # Ids are stored as int64 (snapshot arrays, the local merge's staging table)
+    if not isinstance(food_id, int) or isinstance(food_id, bool) or not 0 < food_id < 1 << 63:
+        raise RowError(f"id must be a positive integer, got {raw.get('id')!r}")
+
+    name = raw.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise RowError("name is required")
+    name = name.strip()
+    if len(name) > MAX_NAME_LENGTH:
+        raise RowError(f"name is longer than {MAX_NAME_LENGTH} characters")
+
+    category = raw.get("category")
+    category = category.strip().lower() if isinstance(category, str) else None
+    if not category or (categories is not None and category not in categories):
+        raise RowError(f"Unknown category {raw.get('category')!r}")
+
+    season = raw.get("season") or "all"
+    season = season.strip().lower() if isinstance(season, str) else None
+    if season not in SEASONS:
+        raise RowError(f"Unknown season {raw.get('season')!r}")
+
+    props = raw.get("properties")
+    if props is None:
+        props = []
+    elif isinstance(props, str):
+        props = props.split(",")
+    elif not isinstance(props, list):
+        raise RowError("properties must be a list or a comma-separated string")
+    properties = []
+    for prop in props:
+        if not isinstance(prop, str):
+            raise RowError(f"Invalid property {prop!r}")
+        prop = prop.strip().lower()
+        if not prop:
+            continue
+        if not PROPERTY_PATTERN.match(prop):
+            raise RowError(f"Invalid property {prop!r}: use lowercase letters, digits and underscores")
+        if prop not in properties:
+            properties.append(prop)
+    if len(properties) > MAX_PROPERTIES:
+        raise RowError(f"More than {MAX_PROPERTIES} properties")
+
+    return {"id": food_id, "name": name, "category": category, "season": season, "properties": properties}
+
+
+class CatalogImport:
+    """Incremental parser/validator that applies rows to a catalog in chunks.
+
+    `apply(foods)` receives lists of up to `chunk_size` validated foods in
+    input order; `on_progress(stats)` runs after every applied chunk.
+    """
+
+    def __init__(self, fmt, apply, chunk_size=DEFAULT_CHUNK_SIZE, categories=CATEGORIES, on_progress=None):
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported format {fmt!r}")
+        self.fmt = fmt
+        self.apply = apply
+        self.chunk_size = chunk_size
+        self.categories = categories
+        self.on_progress = on_progress
+        self.stats = {"rows": 0, "imported": 0, "rejected": 0, "chunks": 0, "errors": []}
+        self.started = time.perf_counter()
+        self._partial = ""
+        self._record = ""  # CSV record spanning lines inside a quoted field
+        self._record_line = 0
+        self._line = 0
+        self._skipping = False  # inside an over-long line, dropping it
+        self._header = None
+        self._chunk = []
+
+    def feed(self, text):
+        if self._skipping:
+            end = text.find("\n")
+            if end < 0:
+                return
+            self._skipping = False
+            self._line += 1
+            text = text[end + 1:]
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line += 1
+            self._handle_line(line)
+        if len(self._partial) > MAX_RECORD_LENGTH:
+            # Drop the rest of the line as it arrives rather than buffering it
+            self._reject(self._line + 1, f"Line is longer than {MAX_RECORD_LENGTH} characters")
+            self._partial = ""
+            self._skipping = True
+
+    def close(self):
+        """Flush the last line and chunk and return the final stats"""
+        if self._partial and not self._skipping:
+            self._line += 1
+            self._handle_line(self._partial)
+            self._partial = ""
+        if self._record:
+            self._reject(self._record_line, "Unterminated quoted field")
+            self._record = ""
+        self._flush()
+        return self.progress()
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.stats,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.stats["rows"] / elapsed) if elapsed > 0 else 0,
+        }
+
+    def _handle_line(self, line):
+        line = line.rstrip("\r")
+        if self.fmt == "ndjson":
+            if not line.strip():
+                return
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                self._reject(self._line, f"Invalid JSON: {e}")
+                return
+            self._handle_record(self._line, raw)
+            return
+
+        # A quoted CSV field may contain newlines; an odd number of quotes
+        # so far means the record continues on the next line
+        if self._record:
+            self._record += "\n" + line
+        else:
+            self._record = line
+            self._record_line = self._line
+        if self._record.count('"') % 2:
+            if len(self._record) > MAX_RECORD_LENGTH:
+                self._reject(self._record_line, "Unterminated quoted field")
+                self._record = ""
+            return
+        record, self._record = self._record, ""
+        if not record.strip():
+            return
+        values = next(csv.reader([record]))
+        if self._header is None:
+            self._header = [h.strip().lower() for h in values]
+            missing = {"id", "name", "category", "properties"} - set(self._header)
+            if missing:
+                raise RowError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+            return
+        if len(values) != len(self._header):
+            self._reject(self._record_line, f"Expected {len(self._header)} columns, got {len(values)}")
+            return
+        self._handle_record(self._record_line, dict(zip(self._header, values)))
+
+    def _handle_record(self, line_no, raw):
+        self.stats["rows"] += 1
+        try:
+            food = validate_row(raw, self.categories)
+        except RowError as e:
+            self._reject(line_no, str(e), counted=True)
+            return
+        self._chunk.append(food)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+
+    def _reject(self, line_no, error, counted=False):
+        if not counted:
+            self.stats["rows"] += 1
+        self.stats["rejected"] += 1
+        if len(self.stats["errors"]) < MAX_REPORTED_ERRORS:
+            self.stats["errors"].append({"line": line_no, "error": error})
+
+    def _flush(self):
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        self.apply(chunk)
+        self.stats["imported"] += len(chunk)
+        self.stats["chunks"] += 1
+        if self.on_progress:
+            self.on_progress(self.progress())
+
+
+def detect_format(path):
+    return "ndjson" if path.endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def _catalog_values(food, columns):
+    values = {"id": food["id"], "name": food["name"], "category": food["category"],
+              "season": food.get("season", "all"), "properties": ",".join(food["properties"])}
+    return [values.get(column, "") for column in columns]
+
+
+def write_catalog_csv(path, rows, lineterminator="\n"):
+    """Replace the catalog file atomically so a failed write never truncates it.
+
+    `rows` are lists of CSV values, the header first.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".food-", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f, lineterminator=lineterminator).writerows(rows)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _existing_id(row, id_column):
+    value = row[id_column].strip() if id_column is not None and id_column < len(row) else ""
+    return int(value) if value.isdigit() else None
+
+
+def _merged_rows(f, staged):
+    """The catalog in `f` with the staged foods upserted, header first.
+
+    Existing rows are yielded exactly as parsed; a row whose id was
+    imported is replaced by the imported food at the same position (later
+    rows with the same id are dropped), and ids the catalog did not have
+    follow in the order they first appeared in the input.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None) or COLUMNS
+    yield header
+    columns = [h.strip().lower() for h in header]
+    id_column = columns.index("id") if "id" in columns else None
+
+    while True:
+        batch = list(islice(reader, MERGE_BATCH_SIZE))
+        if not batch:
+            break
+        ids = [food_id for food_id in {_existing_id(row, id_column) for row in batch} if food_id is not None]
+        found = {}
+        if ids:
+            query = f"SELECT id, food, placed FROM incoming WHERE id IN ({','.join('?' * len(ids))})"
+            found = {food_id: (food, placed) for food_id, food, placed in staged.execute(query, ids)}
+        placed = []
+        for row in batch:
+            food_id = _existing_id(row, id_column)
+            if food_id not in found:
+                yield row
+                continue
+            food, already_placed = found[food_id]
+            if not already_placed:
+                yield _catalog_values(json.loads(food), columns)
+                found[food_id] = (food, True)
+                placed.append(food_id)
+        if placed:
+            staged.executemany("UPDATE incoming SET placed = 1 WHERE id = ?", [(food_id,) for food_id in placed])
+
+    for (food,) in staged.execute("SELECT food FROM incoming WHERE NOT placed ORDER BY seq"):
+        yield _catalog_values(json.loads(food), columns)
+
+
+def _print_progress(stats):
+    print(f"  {stats['rows']:,} rows, {stats['imported']:,} imported, {stats['rejected']:,} rejected "
+          f"({stats['rows_per_second']:,} rows/s)", file=sys.stderr)
+
+
+def _read_pieces(path):
+    with open(path, encoding="utf-8") as f:
+        while True:
+            text = f.read(1 << 20)
+            if not text:
+                break
+            yield text
+
+
+def _import_local(args, categories):
+    """Validate the input into a staging table, then merge it into the catalog file.
+
+    The staging table is a temporary on-disk SQLite database (the last row
+    for an id wins), so memory does not grow with the input. The catalog is
+    then streamed once, see _merged_rows; its existing rows are copied, not
+    validated again. The file is left untouched when no row was imported.
+    """
+    # An empty filename gives a private on-disk database deleted on close
+    with closing(sqlite3.connect("")) as staged:
+        staged.execute("CREATE TABLE incoming (id INTEGER PRIMARY KEY, seq INTEGER, food TEXT, "
+                       "placed INTEGER NOT NULL DEFAULT 0)")
+        seq = count()
+
+        def stage(chunk):
+            if args.dry_run:
+                return
+            staged.executemany(
+                "INSERT INTO incoming (id, seq, food) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET food = excluded.food",
+                [(food["id"], next(seq), json.dumps(food)) for food in chunk],
+            )
+
+        importer = CatalogImport(args.format, stage, args.chunk_size, categories,
+                                 on_progress=_print_progress if args.progress else None)
+        for text in _read_pieces(args.path):
+            importer.feed(text)
+        stats = importer.close()
+        if args.dry_run or not stats["imported"]:
+            return stats
+
+        if not os.path.exists(args.csv):
+            write_catalog_csv(args.csv, _merged_rows([], staged))
+            return stats
+        with open(args.csv, newline="", encoding="utf-8") as f:
+            # Keep the file's own line endings so a merge only changes the rows it touches
+            first = f.readline()
+            lineterminator = "\r\n" if first.endswith("\r\n") else "\n"
+            f.seek(0)
+            write_catalog_csv(args.csv, _merged_rows(f, staged), lineterminator)
+    return stats
+
+
+def _import_remote(args):
+    import httpx
+
+    def body():
+        sent = 0
+        with open(args.path, "rb") as f:
+            while True:
+                data = f.read(1 << 20)
+                if not data:
+                    break
+                sent += len(data)
+                if args.progress:
+                    print(f"  sent {sent / (1 << 20):,.1f} MB", file=sys.stderr)
+                yield data
+
+    response = httpx.post(
+        args.url.rstrip("/") + "/admin/catalog/import",
+        params={"format": args.format, "chunk_size": args.chunk_size, "dry_run": args.dry_run},
+        headers={"X-Admin-Token": args.token or "", "Content-Type": "application/octet-stream"},
+        content=body(),
+        timeout=None,
+    )
+    if response.status_code != 200:
+        sys.exit(f"Import failed ({response.status_code}): {response.text}")
+    return response.json()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import foods from CSV or NDJSON")
+    parser.add_argument("path", help="CSV or NDJSON file of foods")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--csv", default="food.csv", help="catalog file to merge into (local import)")
+    parser.add_argument("--url", help="import into a running backend instead, e.g. http://localhost:8002")
+    parser.add_argument("--token", default=os.environ.get("NUTRISYNC_ADMIN_TOKEN"), help="admin token for --url")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--allow-category", action="append", default=[], help="accept an extra category")
+    parser.add_argument("--dry-run", action="store_true", help="validate without changing the catalog")
+    parser.add_argument("--no-progress", dest="progress", action="store_false")
+    args = parser.parse_args(argv)
+    args.format = args.format or detect_format(args.path)
+
+    if args.url:
+        stats = _import_remote(args)
+    else:
+        stats = _import_local(args, CATEGORIES | {c.lower() for c in args.allow_category})
+    print(json.dumps(stats, indent=2))
+    if stats["rejected"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""Catalog-wide compatibility aggregates over the full food x food score grid.
+
+Calling analyze_compatibility for every pair of a 10k-food catalog is 100M
+engine calls per context. Instead, each of the engine's RULE_SECTIONS has a
+NumPy twin below that evaluates the same rules for a block of rows against
+the whole catalog at once, from per-food boolean features. Foods with the
+same category, properties and rule-relevant name collapse into one weighted
+class first (food_classes.FoodClasses), since they score identically
+against everything.
+
+Aggregates are group-by sums over the grid: scores and con flags are summed
+per category pair and per property with indicator-matrix products, and
+every rule counts the pairs it fires on. Pairs are ordered (a, b) with
+a != b; the engine is symmetric, so each unordered pair counts twice and
+means and rates are unaffected.
+
+    python compatibility_analytics.py --season summer --time day --table categories
+    python compatibility_analytics.py --all-contexts --table properties --format arrow -o props.arrow
+
+Arrow output needs pyarrow, which is optional.
+"""
+import argparse
+import csv
+import io
+import sys
+import threading
+from collections import OrderedDict
+from time import perf_counter
+
+import numpy as np
+
+from biochemical_engine import BioChemicalEngine
+from food_classes import TRADITIONAL_NAMES, FoodClasses
+from live_session import age_band
+
+# One age per bracket of the engine's age rules (< 18, 18-30, 31-50, > 50)
+CONTEXT_AGES = (10, 25, 40, 60)
+CONTEXT_SEASONS = ("summer", "winter", "rainy", "any")
+CONTEXT_TIMES = ("day", "night", "any")
+TABLES = ("categories", "properties", "rules")
+# Pair cells evaluated per block; bounds the temporary arrays to a few tens of MB
+BLOCK_CELLS = 1 << 20
+CACHE_SIZE = 64
+
+
+def normalize_context(age, season, time):
+    """The representative (age, season, time) of the rule branch the inputs fall in"""
+    return (
+        CONTEXT_AGES[age_band(age)],
+        season if season in CONTEXT_SEASONS else "any",
+        time if time in CONTEXT_TIMES else "any",
+    )
+
+
+def _traditional_matrix(pairs):
+    size = len(TRADITIONAL_NAMES) + 1
+    matrix = np.zeros((size, size), dtype=bool)
+    for a, b in pairs:
+        i, j = TRADITIONAL_NAMES.index(a), TRADITIONAL_NAMES.index(b)
+        matrix[i, j] = matrix[j, i] = True
+    return matrix
+
+
+_TRADITIONAL_GOOD = _traditional_matrix(BioChemicalEngine.TRADITIONAL_GOOD)
+_TRADITIONAL_BAD = _traditional_matrix(BioChemicalEngine.TRADITIONAL_BAD)
+
+
+class _Block:
+    """Rows `rows` of the class grid against all classes, for one context"""
+
+    def __init__(self, classes, rows, age, season, time):
+        self.c = classes
+        self.rows = rows
+        self.age = age
+        self.season = season
+        self.time = time
+
+    def pair(self, values):
+        """Per-class `values` for the first and second food of each pair"""
+        return values[self.rows, None], values[None, :]
+
+    def shared_properties(self):
+        return self.c.prop_matrix[self.rows] @ self.c.prop_matrix.T
+
+    def both(self, prop):
+        first, second = self.pair(self.c.has(prop))
+        return first & second
+
+    def either(self, prop):
+        first, second = self.pair(self.c.has(prop))
+        return first | second
+
+    def crossed(self, a, b):
+        """a in one food and b in the other, either way round"""
+        a1, a2 = self.pair(a)
+        b1, b2 = self.pair(b)
+        return (a1 & b2) | (b1 & a2)
+
+
+class _Diagonal(_Block):
+    """Each class in `rows` paired with itself"""
+
+    def pair(self, values):
+        return values[self.rows], values[self.rows]
+
+    def shared_properties(self):
+        return self.c.sizes[self.rows]
+
+
+# Each kernel mirrors the engine section of the same name and returns its
+# rules as (message, score change, trigger, pair mask) for the block
+
+def _nutritional(g):
+    c = g.c
+    excellent = False
+    for a, b in BioChemicalEngine.EXCELLENT_PAIRS:
+        excellent = excellent | g.crossed(c.has_all(a), c.has_all(b))
+    good = False
+    for a, b in BioChemicalEngine.GOOD_PAIRS:
+        good = good | g.crossed(c.has_all(a), c.has_all(b))
+    return [
+        ("Excellent nutritional complementarity - nutrients enhance each other's absorption", 2.5,
+         "excellent nutrient pairing", excellent),
+        ("Good nutritional balance - complementary nutrients", 1.5, "good nutrient pairing", good & ~excellent),
+    ]
+
+
+def _digestive(g):
+    c = g.c
+    sour = c.has("sour") | c.has("acidic") | c.has("citrus")
+    rules = [
+        ("Both foods are heavy and may cause digestive discomfort", -2.0, "heavy + heavy", g.both("heavy")),
+        ("Sour/Acidic foods can curdle milk and cause digestive issues", -2.5,
+         "sour|acidic|citrus + milk", g.crossed(sour, c.milk)),
+    ]
+    if g.season == "summer":
+        rules.append(("Too much heating foods in summer can cause discomfort", -1.5,
+                      "heating + heating", g.both("heating")))
+    return rules
+
+
+def _traditional(g):
+    pair = g.pair(g.c.trad)
+    return [
+        ("Traditional combination proven effective in many cultures", 2.0, "traditional pairing",
+         _TRADITIONAL_GOOD[pair]),
+        ("Traditionally considered incompatible in many culinary traditions", -2.0, "traditional pairing",
+         _TRADITIONAL_BAD[pair]),
+    ]
+
+
+def _age(g):
+    c = g.c
+    if g.age < 18:
+        calcium = g.either("calcium")
+        both = calcium & g.either("protein")
+        return [
+            ("Excellent for growing children - provides calcium and protein", 1.0, "calcium, protein", both),
+            ("Good calcium source for children's bone development", 0.5, "calcium", calcium & ~both),
+        ]
+    if g.age > 50:
+        return [("Beneficial for older adults - vitamin D and fiber support health", 1.0, "vitamin_d, fiber",
+                 g.either("vitamin_d") & g.either("fiber"))]
+    if g.age > 30:
+        first, second = g.pair(c.sizes)
+        union = first + second - g.shared_properties()
+        return [("Good nutrient diversity for adult health", 0.5, "6+ properties", union >= 6)]
+    return []
+
+
+def _seasonal(g):
+    c = g.c
+    if g.season == "summer":
+        cooling = c.has("cooling") | c.has("hydration")
+        cooling1, cooling2 = g.pair(cooling)
+        heating1, heating2 = g.pair(c.has("heating"))
+        both = cooling1 & cooling2
+        one = (cooling1 & ~heating2) | (cooling2 & ~heating1)
+        return [
+            ("Perfect summer combination - both cooling and hydrating", 1.5, "cooling|hydration x2", both),
+            ("Good summer choice - provides cooling effect", 0.5, "cooling|hydration", one & ~both),
+        ]
+    if g.season == "winter":
+        immune = g.either("immune_boost")
+        both = immune & g.either("heating")
+        return [
+            ("Excellent winter combination - immune support and warming effect", 1.5, "immune_boost, heating", both),
+            ("Good immune support for winter health", 0.5, "immune_boost", immune & ~both),
+        ]
+    if g.season == "rainy":
+        return [
+            ("Good digestive support during rainy season", 1.0, "digestive + digestive", g.both("digestive")),
+            ("May increase mucus formation during humid rainy season", -1.0, "mucus_forming",
+             g.either("mucus_forming")),
+        ]
+    return []
+
+
+def _time_of_day(g):
+    if g.time == "day":
+        energy = g.either("energy")
+        both = energy & g.either("light")
+        rules = [
+            ("Perfect daytime combination - energizing yet easy to digest", 1.0, "energy, light", both),
+            ("Good energy source for daytime activities", 0.5, "energy", energy & ~both),
+        ]
+        if g.age > 30:
+            rules.append(("May cause sluggishness during workday", -0.5, "heavy + heavy", g.both("heavy")))
+        return rules
+    if g.time == "night":
+        both = g.both("digestive")
+        return [
+            ("Excellent evening combination - promotes good digestion and sleep", 1.0, "digestive + digestive", both),
+            ("Supports digestion before sleep", 0.5, "digestive", g.either("digestive") & ~both),
+            ("May interfere with sleep quality", -1.0, "heating + heating | stimulant",
+             g.both("heating") | g.either("stimulant")),
+        ]
+    return []
+
+
+def _scientific(g):
+    return [
+        ("Scientifically proven: Vitamin C enhances Iron absorption", 1.5, "iron, vitamin_c",
+         g.either("iron") & g.either("vitamin_c")),
+        ("Balanced nutrition: Protein + Carbohydrates for sustained energy", 1.0, "protein, carbs",
+         g.either("protein") & g.either("carbs")),
+    ]
+
+
+def _category(g):
+    c = g.c
+    first, second = g.pair(c.category)
+    same = first == second
+    rules = []
+    for category, message, change in (
+        ("fruit", "Fruits complement each other well nutritionally", 0.5),
+        ("vegetable", "Vegetables provide complementary nutrients and fiber", 0.5),
+        ("protein", "Multiple proteins may compete for absorption", -0.5),
+        ("grain", "Multiple grains may cause digestive issues", -0.5),
+    ):
+        if category in c.categories:
+            code = c.categories.index(category)
+            rules.append((message, change, f"category {category}", same & (first == code)))
+    return rules
+
+
+SECTION_KERNELS = {
+    "nutritional": _nutritional,
+    "digestive": _digestive,
+    "traditional": _traditional,
+    "age": _age,
+    "seasonal": _seasonal,
+    "time_of_day": _time_of_day,
+    "scientific": _scientific,
+    "category": _category,
+}
+if list(SECTION_KERNELS) != [name for name, _, _ in BioChemicalEngine.RULE_SECTIONS]:
+    raise ImportError("compatibility_analytics is out of date with BioChemicalEngine.RULE_SECTIONS")
+
+
+def _blocks(classes):
+    step = max(1, BLOCK_CELLS // max(classes.n, 1))
+    for start in range(0, classes.n, step):
+        yield slice(start, min(start + step, classes.n))
+
+
+def _section_deltas(g, shape):
+    deltas = {}
+    for name, kernel in SECTION_KERNELS.items():
+        delta = np.zeros(shape, dtype=np.float32)
+        for _, change, _, mask in kernel(g):
+            delta += np.float32(change) * mask
+        deltas[name] = delta
+    return deltas
+
+
+def section_grid(classes, rows, age, season, time):
+    """{section: score change} for the class block `rows`, for checking against the engine"""
+    g = _Block(classes, rows, age, season, time)
+    return _section_deltas(g, (len(range(classes.n)[rows]), classes.n))
+
+
+def self_scores(classes, age, season, time):
+    """Score of every class paired with itself, without building the grid"""
+    g = _Diagonal(classes, slice(0, classes.n), age, season, time)
+    deltas = _section_deltas(g, (classes.n,))
+    return np.clip(sum(deltas.values()) + 5.0, 1.0, 10.0)
+
+
+def pair_scores(classes, age, season, time):
+    """Final score of every class pair, as analyze_compatibility reports it"""
+    grid = section_grid(classes, slice(0, classes.n), age, season, time)
+    return np.clip(sum(grid.values()) + 5.0, 1.0, 10.0)
+
+
+def analyze(foods, age=30, season="any", time="day"):
+    """Aggregate compatibility of every ordered food pair under one context.
+
+    Returns {"foods", "pairs", "mean_score", "con_rate", "tables"} where
+    each table is a dict of equal-length columns.
+    """
+    age, season, time = normalize_context(age, season, time)
+    c = foods if isinstance(foods, FoodClasses) else FoodClasses(foods)
+    n_cat, n_prop = len(c.categories), len(c.properties)
+    cat_sums = np.zeros((3, n_cat, n_cat))
+    prop_rows = np.zeros((3, n_prop))     # pairs whose first food has the property
+    prop_both = np.zeros((3, n_prop))     # ... and whose second food has it too
+    col_sums = np.zeros((3, c.n))
+    rules = OrderedDict()
+
+    for rows in _blocks(c):
+        g = _Block(c, rows, age, season, time)
+        index = np.arange(rows.start, rows.stop)
+        # Pair weight: class sizes multiplied, minus each food paired with itself
+        weight = c.weights[rows, None] * c.weights[None, :]
+        weight[index - rows.start, index] -= c.weights[rows]
+
+        delta = np.zeros(weight.shape, dtype=np.float32)
+        con = np.zeros(weight.shape, dtype=bool)
+        for section, kernel in SECTION_KERNELS.items():
+            for message, change, trigger, mask in kernel(g):
+                mask = np.broadcast_to(mask, weight.shape)
+                delta += np.float32(change) * mask
+                if change < 0:
+                    con |= mask
+                key = (section, message)
+                if key not in rules:
+                    rules[key] = [change, trigger, 0.0]
+                rules[key][2] += weight.sum(where=mask)
+        score = np.clip(delta + 5.0, 1.0, 10.0)
+
+        for k, values in enumerate((weight, weight * score, weight * con)):
+            cat_sums[k] += c.cat_matrix[rows].T @ values @ c.cat_matrix
+            prop_rows[k] += c.prop_matrix[rows].T @ values.sum(axis=1)
+            prop_both[k] += (c.prop_matrix[rows] * (values @ c.prop_matrix)).sum(axis=0)
+            col_sums[k] += values.sum(axis=0)
+
+    # Pairs with the property in either food: first + second - both
+    prop_sums = prop_rows + col_sums @ c.prop_matrix - prop_both
+    pairs, score_sum, con_sum = cat_sums.sum(axis=(1, 2))
+
+    cat_a, cat_b = np.nonzero(cat_sums[0])
+    cat_pairs = cat_sums[0][cat_a, cat_b]
+    order = np.argsort(-prop_sums[2] / np.maximum(prop_sums[0], 1), kind="stable")
+    order = order[prop_sums[0][order] > 0]
+    return {
+        "foods": c.foods,
+        "pairs": int(pairs),
+        "mean_score": round(float(score_sum / pairs), 3) if pairs else None,
+        "con_rate": round(float(con_sum / pairs), 4) if pairs else None,
+        "tables": {
+            "categories": {
+                "category_a": [c.categories[i] for i in cat_a],
+                "category_b": [c.categories[j] for j in cat_b],
+                "pairs": cat_pairs.astype(np.int64).tolist(),
+                "mean_score": np.round(cat_sums[1][cat_a, cat_b] / cat_pairs, 3).tolist(),
+                "con_rate": np.round(cat_sums[2][cat_a, cat_b] / cat_pairs, 4).tolist(),
+            },
+            "properties": {
+                "property": [c.properties[i] for i in order],
+                "pairs": prop_sums[0][order].astype(np.int64).tolist(),
+                "mean_score": np.round(prop_sums[1][order] / prop_sums[0][order], 3).tolist(),
+                "con_pairs": prop_sums[2][order].astype(np.int64).tolist(),
+                "con_rate": np.round(prop_sums[2][order] / prop_sums[0][order], 4).tolist(),
+            },
+            "rules": {
+                "section": [section for section, _ in rules],
+                "message": [message for _, message in rules],
+                "effect": ["pro" if change > 0 else "con" for change, _, _ in rules.values()],
+                "score_change": [change for change, _, _ in rules.values()],
+                "trigger": [trigger for _, trigger, _ in rules.values()],
+                "pairs": [int(count) for _, _, count in rules.values()],
+                "share": [round(count / pairs, 4) if pairs else 0.0 for _, _, count in rules.values()],
+            },
+        },
+    }
+
+
+class CompatibilityAnalytics:
+    """analyze() results cached per catalog version and context branch.
+
+    Computations are serialized, so concurrent requests for the same
+    uncached context wait for one computation instead of repeating it.
+    Cache hits only take the cache lock and never wait behind a
+    computation.
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._classes = (None, None)  # (version, FoodClasses)
+        self._cache_lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        # Optional metrics.record_cache; counts result cache hits and misses
+        self.record_cache = None
+
+    def _cached(self, key):
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        if result is not None and self.record_cache:
+            self.record_cache("compatibility_analytics", 1, 0)
+        return result
+
+    def get(self, version, foods, age=30, season="any", time="day"):
+        key = (version, *normalize_context(age, season, time))
+        result = self._cached(key)
+        if result is not None:
+            return result
+        with self._compute_lock:
+            # Another request may have computed it while this one waited
+            result = self._cached(key)
+            if result is not None:
+                return result
+            if self.record_cache:
+                self.record_cache("compatibility_analytics", 0, 1)
+            if self._classes[0] != version:
+                self._classes = (version, FoodClasses(foods))
+            started = perf_counter()
+            result = analyze(self._classes[1], *key[1:])
+            result = {
+                "version": version,
+                "context": dict(zip(("age", "season", "time"), key[1:])),
+                **result,
+                "seconds": round(perf_counter() - started, 3),
+            }
+            with self._cache_lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return result
+
+
+def table_to_csv(columns):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(list(columns))
+    writer.writerows(zip(*columns.values()))
+    return out.getvalue()
+
+
+def table_to_arrow(columns):
+    """Arrow IPC stream bytes for a table (needs pyarrow)"""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Arrow output needs pyarrow: pip install pyarrow") from e
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _context_rows(result, table):
+    """A table with the context prepended as columns, for multi-context exports"""
+    columns = result["tables"][table]
+    n = len(next(iter(columns.values()))) if columns else 0
+    context = {name: [value] * n for name, value in result["context"].items()}
+    return {**context, **columns}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compatibility aggregates over every food pair in the catalog")
+    parser.add_argument("--csv", default="food.csv", help="catalog file")
+    parser.add_argument("--table", choices=TABLES, default="categories")
+    parser.add_argument("--age", type=int, default=30)
+    parser.add_argument("--season", default="any")
+    parser.add_argument("--time", default="day")
+    parser.add_argument("--all-contexts", action="store_true", help="every age bracket, season and time")
+    parser.add_argument("--format", choices=["csv", "arrow"], default="csv")
+    parser.add_argument("-o", "--output", help="default: stdout (csv only)")
+    args = parser.parse_args(argv)
+    if args.format == "arrow" and not args.output:
+        parser.error("--format arrow needs --output")
+
+    # Parsed exactly as the backend parses the catalog it serves
+    from shared_catalog import read_food_csv
+
+    foods = read_food_csv(args.csv)
+    analytics = CompatibilityAnalytics()
+    if args.all_contexts:
+        contexts = [(a, s, t) for a in CONTEXT_AGES for s in CONTEXT_SEASONS for t in CONTEXT_TIMES]
+    else:
+        contexts = [(args.age, args.season, args.time)]
+
+    columns = {}
+    for age, season, time_of_day in contexts:
+        result = analytics.get("cli", foods, age, season, time_of_day)
+        print(f"  age {result['context']['age']}, {result['context']['season']}, {result['context']['time']}: "
+              f"{result['pairs']:,} pairs in {result['seconds']}s", file=sys.stderr)
+        for name, values in _context_rows(result, args.table).items():
+            columns.setdefault(name, []).extend(values)
+
+    if args.format == "arrow":
+        with open(args.output, "wb") as f:
+            f.write(table_to_arrow(columns))
+    elif args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            f.write(table_to_csv(columns))
+    else:
+        sys.stdout.write(table_to_csv(columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Dose, frequency and duration extraction from prescription text.
+
+The preprocessed OCR text is tokenized once by a single compiled regex
+whose alternatives are the token kinds below. Every alternative either
+has bounded repetition or only starts at the beginning of a digit run
+(`(?<![\d.])`), so no run is rescanned from each of its positions and
+the scan stays linear in the length of the text. Medicine mentions are recognized among the
+word tokens, and each dose/frequency/duration token is attached to the
+closest medicine mention before it. Prescriptions put the details after
+the name ("Tab Paracetamol 500mg 1-0-1 x 5 days"); details that come
+before the first medicine attach to it only if it follows right after.
+"""
+import re
+
+_TOKENS = re.compile(
+    r"""
+    (?P<pattern>\b[0-2](?:\.5)?(?:-[0-2](?:\.5)?){2,3}\b)                        # 1-0-1, 1-1-1-1
+  | (?P<duration>\b(?:(?:x|for)\s*)?(?P<duration_n>\d{1,3})\s*
+        (?P<duration_unit>days?|d|weeks?|wks?|w|months?|mths?)\b)               # x 5 days, for 2 weeks
+  | (?P<fraction>\b(?P<fraction_n>\d{1,2})/(?P<fraction_of>7|52|12)\b)          # 5/7 = five days
+  | (?P<strength>(?<![\d.])\d+(?:\.\d+)?(?:/\d+(?:\.\d+)?)?\s*
+        (?P<strength_unit>mg|mcg|ug|gm|g|ml|iu|units?|%)(?![a-z]))              # 500mg, 5 ml, 875/125 mg
+  | (?P<every>\b(?:q\s*(?P<every_q>\d{1,2})\s*h|every\s+(?P<every_n>\d{1,2})\s*(?:hours?|hrs?|h))\b)
+  | (?P<times>\b(?:(?P<times_word>once|twice|thrice)|(?P<times_n>[1-4])\s*times?)\s*(?:a|per)?\s*(?:day|daily)\b)
+  | (?P<abbr>\b(?:od|qd|bd|bid|tds|tid|qid|qds|hs|sos|prn|stat)\b)
+  | (?P<word>[a-z]+)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+FREQUENCY_ABBREVIATIONS = {
+    "od": 1, "qd": 1,
+    "bd": 2, "bid": 2,
+    "tds": 3, "tid": 3,
+    "qid": 4, "qds": 4,
+    "hs": 1,
+    "stat": 1,
+    "sos": None, "prn": None,
+}
+TIMES_WORDS = {"once": 1, "twice": 2, "thrice": 3}
+DURATION_DAYS = {"d": 1, "day": 1, "days": 1, "w": 7, "wk": 7, "wks": 7, "week": 7, "weeks": 7,
+                 "month": 30, "months": 30, "mth": 30, "mths": 30}
+FRACTION_DAYS = {"7": 1, "52": 7, "12": 30}
+PATTERN_SLOTS = {3: ("morning", "afternoon", "night"), 4: ("morning", "afternoon", "evening", "night")}
+
+# Characters allowed between a medicine (or its last detail) and the next
+# detail; further away, a number most likely belongs to something else
+MAX_GAP = 40
+# Details before the first medicine only attach if it follows this closely
+MAX_LEADING_GAP = 20
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _frequency(match):
+    text = match.group()
+    kind = match.lastgroup
+    if kind == "pattern":
+        doses = [_number(part) for part in text.split("-")]
+        slots = PATTERN_SLOTS[len(doses)]
+        return {
+            "text": text,
+            "times_per_day": sum(1 for d in doses if d),
+            "schedule": [slot for slot, dose in zip(slots, doses) if dose],
+            "as_needed": False,
+        }
+    if kind == "every":
+        hours = int(match.group("every_q") or match.group("every_n"))
+        return {"text": text, "times_per_day": 24 // hours if hours else None, "as_needed": False}
+    if kind == "times":
+        word = match.group("times_word")
+        times = TIMES_WORDS[word.lower()] if word else int(match.group("times_n"))
+        return {"text": text, "times_per_day": times, "as_needed": False}
+    abbr = text.lower()
+    frequency = {"text": text, "times_per_day": FREQUENCY_ABBREVIATIONS[abbr], "as_needed": abbr in ("sos", "prn")}
+    if abbr == "hs":
+        frequency["schedule"] = ["bedtime"]
+    return frequency
+
+
+def _detail(match):
+    """(field, value) for a detail token"""
+    kind = match.lastgroup
+    if kind == "strength":
+        amount = match.group()[:match.start("strength_unit") - match.start()].strip()
+        return "strength", {"text": match.group(), "amount": amount, "unit": match.group("strength_unit").lower()}
+    if kind == "duration":
+        n = int(match.group("duration_n"))
+        return "duration", {"text": match.group(), "days": n * DURATION_DAYS[match.group("duration_unit").lower()]}
+    if kind == "fraction":
+        n = int(match.group("fraction_n"))
+        return "duration", {"text": match.group(), "days": n * FRACTION_DAYS[match.group("fraction_of")]}
+    return "frequency", _frequency(match)
+
+
+def _anchor_lookup(medicine_names):
+    """Word matcher for the medicines already found in the text.
+
+    Mirrors extract_medicine_names: a word is a mention if it is the name,
+    or, for names longer than six letters, starts with the name minus its
+    last two letters (OCR often garbles word endings).
+    """
+    exact = {}
+    prefixes = {}
+    for med in medicine_names:
+        med = med.lower()
+        exact[med] = med
+        if len(med) > 6:
+            prefixes.setdefault(len(med) - 2, {})[med[:-2]] = med
+    prefix_lengths = sorted(prefixes)
+
+    def lookup(word):
+        med = exact.get(word)
+        if med is not None:
+            return med
+        for length in prefix_lengths:
+            if length > len(word):
+                break
+            med = prefixes[length].get(word[:length])
+            if med is not None:
+                return med
+        return None
+
+    return lookup
+
+
+def extract_dosages(text, medicine_names):
+    """Strength, frequency and duration for each of `medicine_names` found in `text`.
+
+    Returns {medicine: {"strength": ..., "frequency": ..., "duration": ...}}
+    with None for details that were not found. When a medicine is
+    mentioned more than once, missing details are filled from later
+    mentions.
+    """
+    dosages = {med.lower(): {"strength": None, "frequency": None, "duration": None} for med in medicine_names}
+    if not dosages:
+        return dosages
+    lookup = _anchor_lookup(dosages)
+
+    current = None     # medicine whose details are being read
+    last_end = 0       # end of the medicine mention or its last detail
+    leading = []       # (end, field, value) seen before any medicine
+    for match in _TOKENS.finditer(text):
+        if match.lastgroup == "word":
+            med = lookup(match.group().lower())
+            if med is None:
+                continue
+            if current is None and leading and match.start() - leading[-1][0] <= MAX_LEADING_GAP:
+                for _, field, value in leading:
+                    if dosages[med][field] is None:
+                        dosages[med][field] = value
+            leading = []
+            current = med
+            last_end = match.end()
+            continue
+
+        field, value = _detail(match)
+        if current is not None and match.start() - last_end <= MAX_GAP:
+            if dosages[current][field] is None:
+                dosages[current][field] = value
+            last_end = match.end()
+        elif current is None:
+            if leading and match.start() - leading[-1][0] > MAX_LEADING_GAP:
+                leading = []
+            leading.append((match.end(), field, value))
+    return dosages
@@ -0,0 +1,148 @@
+"""Structured drug-food interactions keyed by medicine and food property.
+
+MEDICINE_DB only carries free-text warnings. This table spells out which
+food properties interact with which medicines so meals can be checked
+against a prescription. Entries are indexed both ways at load time, so
+a check costs one dict lookup per (food property, medicine) candidate
+instead of a scan over the whole table.
+"""
+import heapq
+from itertools import count
+
+# severity: "high" = avoid or strictly control, "moderate" = separate or
+# limit, "low" = worth knowing
+DRUG_FOOD_INTERACTIONS = [
+    {"medicine": "warfarin", "property": "vitamin_k", "severity": "high",
+     "advice": "Vitamin K counteracts warfarin. Keep intake of leafy greens consistent from day to day."},
+    {"medicine": "warfarin", "property": "omega_3", "severity": "moderate",
+     "advice": "Large amounts of omega-3 rich foods may add to warfarin's blood-thinning effect."},
+    {"medicine": "warfarin", "property": "anti_inflammatory", "severity": "moderate",
+     "advice": "Garlic, ginger and turmeric in large amounts may increase bleeding risk with warfarin."},
+    {"medicine": "levothyroxine", "property": "calcium", "severity": "high",
+     "advice": "Calcium blocks levothyroxine absorption. Take dairy at least 4 hours after the dose."},
+    {"medicine": "levothyroxine", "property": "iron", "severity": "moderate",
+     "advice": "Iron reduces levothyroxine absorption. Separate iron-rich meals from the dose by 4 hours."},
+    {"medicine": "levothyroxine", "property": "fiber", "severity": "low",
+     "advice": "High-fiber meals can lower levothyroxine absorption. Take the dose on an empty stomach."},
+    {"medicine": "lisinopril", "property": "potassium", "severity": "moderate",
+     "advice": "Lisinopril raises potassium levels. Avoid large amounts of potassium-rich foods."},
+    {"medicine": "amlodipine", "property": "potassium", "severity": "low",
+     "advice": "Discuss high-potassium diets with your doctor if you also take other blood pressure medicines."},
+    {"medicine": "metformin", "property": "sweet", "severity": "low",
+     "advice": "Sugary foods work against blood sugar control with metformin."},
+    {"medicine": "prednisone", "property": "salty", "severity": "moderate",
+     "advice": "Prednisone causes fluid retention. Limit salty foods."},
+    {"medicine": "prednisone", "property": "sweet", "severity": "low",
+     "advice": "Prednisone can raise blood sugar. Limit sweet foods."},
+    {"medicine": "albuterol", "property": "stimulant", "severity": "moderate",
+     "advice": "Caffeine adds to albuterol's effect on heart rate and tremor."},
+    {"medicine": "omeprazole", "property": "iron", "severity": "low",
+     "advice": "Reduced stomach acid lowers iron absorption from food during long-term use."},
+    {"medicine": "ibuprofen", "property": "sour", "severity": "low",
+     "advice": "Acidic foods can add to stomach irritation. Take ibuprofen with a full meal."},
+    {"medicine": "sertraline", "property": "stimulant", "severity": "low",
+     "advice": "Caffeine may worsen sertraline-related insomnia or jitteriness."},
+]
+
+SEVERITY_ORDER = {"high": 0, "moderate": 1, "low": 2}
+DEFAULT_CONFLICT_LIMIT = 100
+
+
+def _unique_by_id(foods):
+    seen = set()
+    for food in foods:
+        if food["id"] not in seen:
+            seen.add(food["id"])
+            yield food
+
+
+class InteractionIndex:
+    """Interactions by medicine and by property, plus the foods having each property.
+
+    With a SharedCatalog, foods are found through the snapshot's property
+    index instead of per-process buckets.
+    """
+
+    def __init__(self, interactions, foods=(), catalog=None):
+        self.by_medicine = {}  # medicine -> {property: interaction}
+        self.by_property = {}  # property -> {medicine: interaction}
+        for entry in interactions:
+            medicine = entry["medicine"].lower()
+            prop = entry["property"].lower()
+            self.by_medicine.setdefault(medicine, {})[prop] = entry
+            self.by_property.setdefault(prop, {})[medicine] = entry
+
+        # Only properties that interact with something are worth indexing
+        self.catalog = catalog
+        self.foods_by_property = {}  # property -> {food id: food}
+        for food in foods:
+            self.upsert(food)
+
+    def upsert(self, food, previous=None):
+        """Index a new food, or replace `previous` (same id) with it"""
+        if previous is not None:
+            for prop in previous["properties"]:
+                self.foods_by_property.get(prop.lower(), {}).pop(previous["id"], None)
+        for prop in food["properties"]:
+            prop = prop.lower()
+            if prop in self.by_property:
+                self.foods_by_property.setdefault(prop, {})[food["id"]] = food
+
+    def for_medicine(self, medicine):
+        """Food properties to watch for one medicine, most severe first"""
+        entries = self.by_medicine.get(medicine.lower(), {})
+        return sorted(
+            ({"property": prop, "severity": e["severity"], "advice": e["advice"]} for prop, e in entries.items()),
+            key=lambda e: (SEVERITY_ORDER.get(e["severity"], 3), e["property"]),
+        )
+
+    def conflicts(self, medicines, foods=None, limit=DEFAULT_CONFLICT_LIMIT):
+        """The `limit` most severe interactions between the given medicines and foods,
+        and how many there are in total.
+
+        With no food list, every catalog food with an interacting property
+        is checked. A food listed twice (same id) is checked once.
+        """
+        meds = {m.lower() for m in medicines if m.lower() in self.by_medicine}
+        if not meds:
+            return [], 0
+
+        if foods is None:
+            props = {prop for med in meds for prop in self.by_medicine[med]}
+            if self.catalog is not None:
+                rows = set()
+                for prop in props:
+                    rows.update(self.catalog.rows_with_property(prop).tolist())
+                foods = (self.catalog.foods[row] for row in sorted(rows))
+            else:
+                foods = (food for prop in props for food in self.foods_by_property.get(prop, {}).values())
+
+        def matches():
+            for food in _unique_by_id(foods):
+                for prop in food["properties"]:
+                    hits = self.by_property.get(prop.lower())
+                    if not hits:
+                        continue
+                    # Walk whichever side is smaller: this property's medicines or the prescription
+                    if len(hits) <= len(meds):
+                        matched = [(m, e) for m, e in hits.items() if m in meds]
+                    else:
+                        matched = [(m, hits[m]) for m in meds if m in hits]
+                    for medicine, entry in matched:
+                        yield food, prop.lower(), medicine, entry
+
+        # Rank on plain tuples and only build dicts for the kept conflicts;
+        # the sequence number keeps ties in the order they were found
+        counter = count()
+        ranked = ((SEVERITY_ORDER.get(entry["severity"], 3), medicine.title(), food["name"], food["id"], next(counter),
+                   prop, entry) for food, prop, medicine, entry in matches())
+        top = heapq.nsmallest(limit, ranked)
+        total = next(counter)
+        return [{
+            "medicine": medicine,
+            "food_id": food_id,
+            "food": food_name,
+            "property": prop,
+            "severity": entry["severity"],
+            "advice": entry["advice"],
+        } for _, medicine, food_name, food_id, _, prop, entry in top], total
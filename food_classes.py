@@ -0,0 +1,96 @@
+"""Catalog foods grouped into classes that score alike.
+
+The engine's rules only read a food's category, its property set and a few
+facts about its name (whether it is one of the traditional pairing names,
+and whether it contains "milk"). Foods that agree on all of these score
+identically against every other food, so vectorized scoring works on one
+weighted row per class instead of one per food.
+"""
+import numpy as np
+
+from biochemical_engine import BioChemicalEngine
+
+# Names the engine's traditional pairing rules look for
+TRADITIONAL_NAMES = sorted({name for pair in BioChemicalEngine.TRADITIONAL_GOOD + BioChemicalEngine.TRADITIONAL_BAD
+                            for name in pair})
+
+
+class FoodClasses:
+    """Per-class features of a catalog: foods that score alike share a row.
+
+    Attributes:
+        n: number of classes
+        foods: number of foods grouped
+        food_rows: class row of each food, in catalog order
+        weights: foods per class
+        properties, categories: sorted vocabularies
+        props: (n, len(properties)) bool matrix of class properties
+        category: category code of each class
+        trad: TRADITIONAL_NAMES code of each class, len(TRADITIONAL_NAMES)
+            for any other name
+        milk: whether the class's name contains "milk"
+        sizes: number of properties of each class
+        prop_matrix, cat_matrix: float indicator matrices for group-by sums
+    """
+
+    def __init__(self, foods):
+        trad_codes = {name: i for i, name in enumerate(TRADITIONAL_NAMES)}
+        self._rows = classes = {}
+        weights = []
+        food_rows = []
+        for food in foods:
+            key = self.key(food)
+            row = classes.get(key)
+            if row is None:
+                row = classes[key] = len(weights)
+                weights.append(0)
+            weights[row] += 1
+            food_rows.append(row)
+        self.food_rows = np.array(food_rows, dtype=np.int64)
+
+        keys = list(classes)
+        self.n = len(keys)
+        self.foods = len(foods)
+        self.weights = np.array(weights, dtype=np.float64)
+        self.properties = sorted({p for key in keys for p in key[3]})
+        self.categories = sorted({key[2] for key in keys})
+        prop_codes = {p: i for i, p in enumerate(self.properties)}
+        cat_codes = {c: i for i, c in enumerate(self.categories)}
+
+        self.props = np.zeros((self.n, len(self.properties)), dtype=bool)
+        self.category = np.empty(self.n, dtype=np.int32)
+        self.trad = np.full(self.n, len(TRADITIONAL_NAMES), dtype=np.int32)
+        self.milk = np.zeros(self.n, dtype=bool)
+        for row, (trad_name, milk, category, props) in enumerate(keys):
+            self.props[row, [prop_codes[p] for p in props]] = True
+            self.category[row] = cat_codes[category]
+            if trad_name:
+                self.trad[row] = trad_codes[trad_name]
+            self.milk[row] = milk
+        self.sizes = self.props.sum(axis=1)
+        self.prop_matrix = self.props.astype(np.float64)
+        self.cat_matrix = np.zeros((self.n, len(self.categories)), dtype=np.float64)
+        self.cat_matrix[np.arange(self.n), self.category] = 1.0
+        self._missing = np.zeros(self.n, dtype=bool)
+
+    @staticmethod
+    def key(food):
+        """Everything the engine's rules read from a food"""
+        name = food["name"].lower()
+        return (name if name in TRADITIONAL_NAMES else "", "milk" in name, food["category"],
+                frozenset(food["properties"]))
+
+    def row(self, food):
+        """Class row of a food that was in the grouped catalog"""
+        return self._rows[self.key(food)]
+
+    def has(self, prop):
+        """Per-class bool array: the class has `prop`"""
+        column = self.properties.index(prop) if prop in self.properties else None
+        return self._missing if column is None else self.props[:, column]
+
+    def has_all(self, props):
+        result = np.ones(self.n, dtype=bool)
+        for prop in props:
+            result &= self.has(prop)
+        return result
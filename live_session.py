@@ -0,0 +1,86 @@
+"""Server-side state for live compatibility sessions.
+
+A session holds the current selection (two foods plus age, season and
+time) and the last result of each of the engine's rule sections. When one
+input changes, only the sections that depend on it are re-run and the
+score is re-summed from the cached section results, so a season change
+costs the digestive and seasonal rules instead of all eight.
+"""
+
+
+def age_band(age):
+    """The age brackets the engine's rules distinguish: < 18, 18-30, 31-50, > 50"""
+    if age < 18:
+        return 0
+    if age <= 30:
+        return 1
+    if age <= 50:
+        return 2
+    return 3
+
+
+class CompatibilitySession:
+    def __init__(self, engine, age=25, season="any", time="day"):
+        self.engine = engine
+        self.food1 = None
+        self.food2 = None
+        self.age = age
+        self.season = season
+        self.time = time
+        self._facts = (None, None)
+        self._sections = {}  # section name -> (score, pros, cons)
+
+    @property
+    def ready(self):
+        return self.food1 is not None and self.food2 is not None
+
+    def update(self, food1=None, food2=None, age=None, season=None, time=None):
+        """Apply the given inputs (None = unchanged) and return the section names re-run"""
+        changed = set()
+        if food1 is not None and (self.food1 is None or food1["id"] != self.food1["id"]):
+            self.food1 = food1
+            changed.add("food")
+        if food2 is not None and (self.food2 is None or food2["id"] != self.food2["id"]):
+            self.food2 = food2
+            changed.add("food")
+        if age is not None and age != self.age:
+            # Moving within a bracket cannot change any rule's outcome
+            if age_band(age) != age_band(self.age):
+                changed.add("age")
+            self.age = age
+        if season is not None and season != self.season:
+            self.season = season
+            changed.add("season")
+        if time is not None and time != self.time:
+            self.time = time
+            changed.add("time")
+
+        if not self.ready:
+            return []
+        if "food" in changed:
+            self._facts = (self.engine.food_facts(self.food1), self.engine.food_facts(self.food2))
+            self._sections.clear()
+
+        facts1, facts2 = self._facts
+        recomputed = []
+        for name, inputs, rule in self.engine.RULE_SECTIONS:
+            if name in self._sections and not changed.intersection(inputs):
+                continue
+            pros, cons = [], []
+            score = rule(self.engine, facts1, facts2, self.age, self.season, self.time, pros, cons)
+            self._sections[name] = (score, pros, cons)
+            recomputed.append(name)
+        return recomputed
+
+    def result(self):
+        """The same result analyze_compatibility gives for the current inputs"""
+        if not self.ready:
+            return None
+        score = 5.0
+        pros, cons = [], []
+        for name, _, _ in self.engine.RULE_SECTIONS:
+            section_score, section_pros, section_cons = self._sections[name]
+            score += section_score
+            pros.extend(section_pros)
+            cons.extend(section_cons)
+        return self.engine.finish(score, pros, cons)
@@ -0,0 +1,378 @@
+"""End-to-end HTTP load test for the NutriSync API.
+
+Replays a weighted mix of /foods, /predict_compatibility, /suggest_foods and
+/scan requests at increasing concurrency and reports latency percentiles,
+histograms, error rates, throughput and event-loop lag for each level.
+A request counts as an error if it fails, returns an HTTP error status, or
+returns a JSON body with "success": false (/scan reports OCR and upload
+problems that way with a 200).
+
+Three targets are supported, all of which run offline on one machine:
+
+    python loadtest.py --mode asgi                   # call the app in-process, no sockets
+    python loadtest.py --mode uvicorn                # start uvicorn in this process, go over TCP
+    python loadtest.py --mode url --url http://127.0.0.1:8002
+
+In asgi and uvicorn modes tesseract is replaced by a stub that sleeps for
+--ocr-ms and returns a fixed prescription, so /scan timings are repeatable.
+The url and uvicorn modes need httpx (pip install httpx).
+
+Event-loop lag is sampled on the loop running the load generator. In asgi
+mode that is also the loop serving the app, so blocking work inside an
+endpoint (such as OCR) shows up directly as lag.
+"""
+import argparse
+import asyncio
+import bisect
+import io
+import json
+import random
+import socket
+import statistics
+import threading
+import time
+
+import backend
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+DEFAULT_MIX = "foods=30,predict=45,suggest=20,scan=5"
+STUB_PRESCRIPTION = (
+    "Dr. A. Example\nRx\nTab Paracetamol 500mg 1-0-1 x 5 days\n"
+    "Cap Amoxicillin 250mg TDS x 7 days\nTab Omeprazole 20mg OD before breakfast\n"
+)
+
+
+def stub_tesseract(ocr_ms):
+    """Replace pytesseract with a fixed-latency fake so /scan is deterministic"""
+    def image_to_string(image, config=None):
+        time.sleep(ocr_ms / 1000)
+        return STUB_PRESCRIPTION
+    import pytesseract
+
+    pytesseract.image_to_string = image_to_string
+
+
+def sample_image():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("L", (400, 200), color=255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def multipart_body(field, filename, content, content_type="image/png"):
+    boundary = f"----nutrisync{random.getrandbits(64):016x}"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class RequestMix:
+    """Builds (name, method, path, headers, body) tuples in the configured proportions"""
+
+    def __init__(self, spec, seed):
+        self.rng = random.Random(seed)
+        self.weights = {}
+        for part in spec.split(","):
+            name, weight = part.split("=")
+            if name not in ("foods", "predict", "suggest", "scan"):
+                raise ValueError(f"Unknown request type '{name}' in mix")
+            self.weights[name] = float(weight)
+        self.food_ids = [f["id"] for f in backend.FOODS]
+        self.image = sample_image() if "scan" in self.weights else None
+
+    def next(self):
+        name = self.rng.choices(list(self.weights), weights=list(self.weights.values()))[0]
+        json_headers = {"content-type": "application/json"}
+        profile = {
+            "age": self.rng.choice([10, 25, 40, 65]),
+            "season": self.rng.choice(["summer", "winter", "rainy"]),
+            "time": self.rng.choice(["day", "night"]),
+        }
+        if name == "foods":
+            return name, "GET", "/foods", {}, b""
+        if name == "predict":
+            body = dict(profile, food1_id=self.rng.choice(self.food_ids), food2_id=self.rng.choice(self.food_ids))
+            return name, "POST", "/predict_compatibility", json_headers, json.dumps(body).encode()
+        if name == "suggest":
+            body = dict(profile, disease=self.rng.choice(["none", "diabetes", "anemia", "gut"]))
+            return name, "POST", "/suggest_foods", json_headers, json.dumps(body).encode()
+        body, content_type = multipart_body("file", "prescription.png", self.image)
+        return name, "POST", "/scan", {"content-type": content_type}, body
+
+
+class ASGIClient:
+    """Calls the ASGI app directly, skipping sockets and HTTP parsing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, headers, body):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()]
+                       + [(b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": ("loadtest", 80),
+        }
+        delivered = False
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Nothing more to send; wait until the app stops listening
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def close(self):
+        pass
+
+
+class HTTPClient:
+    def __init__(self, base_url, concurrency):
+        import httpx
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+
+    async def request(self, method, path, headers, body):
+        response = await self.client.request(method, path, headers=headers, content=body)
+        return response.status_code, response.content
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task sleeping for `interval`"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected) * 1000)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def reports_failure(body):
+    """True for a JSON object body with "success": false"""
+    if b'"success"' not in body:
+        return False
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and payload.get("success") is False
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 3)
+
+
+def summarize(latencies, errors):
+    values = sorted(latencies)
+    labels = ["+inf" if bound == float("inf") else f"<={bound:g}ms" for bound in HISTOGRAM_BUCKETS_MS]
+    counts = [0] * len(HISTOGRAM_BUCKETS_MS)
+    for value in values:
+        counts[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, value)] += 1
+    histogram = dict(zip(labels, counts))
+    total = len(values) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p90_ms": percentile(values, 90),
+        "p99_ms": percentile(values, 99),
+        "max_ms": round(values[-1], 3) if values else None,
+        "mean_ms": round(statistics.fmean(values), 3) if values else None,
+        "histogram": histogram,
+    }
+
+
+async def run_level(client, mix, concurrency, duration, max_requests):
+    latencies = {}
+    errors = {}
+    issued = 0
+    deadline = time.perf_counter() + duration
+    monitor = LoopLagMonitor()
+    monitor.start()
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline and (not max_requests or issued < max_requests):
+            issued += 1
+            name, method, path, headers, body = mix.next()
+            started = time.perf_counter()
+            try:
+                status, content = await client.request(method, path, headers, body)
+                failed = status is None or status >= 400 or reports_failure(content)
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            if failed:
+                errors[name] = errors.get(name, 0) + 1
+            else:
+                latencies.setdefault(name, []).append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    overall = summarize(all_latencies, sum(errors.values()))
+    overall["throughput_rps"] = round(overall["requests"] / wall, 1) if wall else 0.0
+    lag = sorted(monitor.samples)
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(wall, 3),
+        "overall": overall,
+        "endpoints": {
+            name: summarize(latencies.get(name, []), errors.get(name, 0))
+            for name in sorted(set(latencies) | set(errors))
+        },
+        "loop_lag_ms": {
+            "p50": percentile(lag, 50),
+            "p99": percentile(lag, 99),
+            "max": round(lag[-1], 3) if lag else None,
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(port):
+    """Serve the app from a background thread so the OCR stub applies to it"""
+    import uvicorn
+
+    config = uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def print_level(result):
+    overall = result["overall"]
+    lag = result["loop_lag_ms"]
+    print(f"\nconcurrency {result['concurrency']}: {overall['requests']} requests in {result['duration_s']}s, "
+          f"{overall['throughput_rps']} req/s, error rate {overall['error_rate']:.2%}, "
+          f"loop lag p99 {lag['p99']} ms (max {lag['max']} ms)")
+    print(f"  {'endpoint':<10} {'reqs':>7} {'errors':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in list(result["endpoints"].items()) + [("all", overall)]:
+        print(f"  {name:<10} {stats['requests']:>7} {stats['errors']:>7} {stats['p50_ms'] or '-':>9} "
+              f"{stats['p90_ms'] or '-':>9} {stats['p99_ms'] or '-':>9} {stats['max_ms'] or '-':>9}")
+
+
+async def main(args):
+    mix = RequestMix(args.mix, args.seed)
+    server = None
+    if args.mode in ("asgi", "uvicorn"):
+        stub_tesseract(args.ocr_ms)
+    if args.mode == "uvicorn":
+        port = free_port()
+        server, thread = start_uvicorn(port)
+        base_url = f"http://127.0.0.1:{port}"
+    else:
+        base_url = args.url
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            if args.mode == "asgi":
+                client = ASGIClient(backend.app)
+            else:
+                client = HTTPClient(base_url, concurrency)
+            try:
+                if args.warmup:
+                    await run_level(client, mix, min(concurrency, 4), args.warmup, 0)
+                result = await run_level(client, mix, concurrency, args.duration, args.requests)
+            finally:
+                await client.close()
+            print_level(result)
+            results.append(result)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=5)
+
+    if args.output:
+        report = {
+            "mode": args.mode,
+            "mix": args.mix,
+            "ocr_ms": args.ocr_ms if args.mode != "url" else None,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "levels": results,
+        }
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the NutriSync API")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn", "url"], default="asgi")
+    parser.add_argument("--url", default="http://127.0.0.1:8002")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted request mix, e.g. foods=1,predict=3")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--requests", type=int, default=0, help="stop a level after this many requests")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of warm-up before each level")
+    parser.add_argument("--ocr-ms", type=float, default=50.0, help="latency of the stubbed tesseract call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the full report as JSON")
+    args = parser.parse_args()
+
+    if args.mode == "url" and "scan" in args.mix:
+        print("Note: /scan runs real tesseract on the target server in url mode")
+    asyncio.run(main(args))
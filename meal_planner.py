@@ -0,0 +1,230 @@
+import threading
+import time as _time
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+
+from compatibility_analytics import normalize_context, self_scores
+from food_classes import FoodClasses
+
+# The engine clamps every pair score to 1.0 - 10.0, so no unseen pair can beat this
+MAX_PAIR_SCORE = 10.0
+# Catalog rankings kept, one per (catalog version, context branch)
+RANKING_CACHE_SIZE = 16
+
+
+class MealPlanner:
+    """Search food combinations for the best multi-item meal.
+
+    Plans are scored by the average pairwise compatibility of their items.
+    The search is an iteratively widened beam search: a greedy pass (width 1)
+    gives a first answer almost immediately, then wider beams refine it until
+    the time budget runs out. Partial plans whose optimistic bound cannot beat
+    the current top-N are pruned, and every pair is scored at most once.
+    """
+
+    def __init__(self, engine, foods):
+        self.engine = engine
+        self.foods = foods
+        self._classes = (None, None)  # (catalog version, FoodClasses)
+        self._rankings = OrderedDict()
+        self._lock = threading.Lock()  # plans run on threadpool threads
+        # Optional metrics.record_cache; counts ranking cache hits and misses
+        self.record_cache = None
+
+    def ranking(self, version, age, season, time):
+        """Catalog rows ordered by how well each food suits the context on its
+        own (its score paired with itself), best first, ties in catalog order.
+
+        Scored with the vectorized analytics kernels and cached per catalog
+        version and context branch; `version=None` skips the cache.
+        """
+        key = (version, *normalize_context(age, season, time))
+        with self._lock:
+            order = self._rankings.get(key) if version is not None else None
+            if version is not None and self.record_cache:
+                hit = order is not None
+                self.record_cache("meal_planner_ranking", int(hit), int(not hit))
+            if order is not None:
+                self._rankings.move_to_end(key)
+                return order
+            classes = self._classes[1]
+            if version is None or self._classes[0] != version:
+                classes = FoodClasses(self.foods)
+                if version is not None:
+                    self._classes = (version, classes)
+            scores = self_scores(classes, *key[1:])[classes.food_rows]
+            order = np.argsort(-scores, kind="stable")
+            if version is not None:
+                self._rankings[key] = order
+                while len(self._rankings) > RANKING_CACHE_SIZE:
+                    self._rankings.popitem(last=False)
+            return order
+
+    def _candidates(self, ranking, category, exclude_ids, exclude_names, exclude_props, limit, deadline, stats):
+        """The first `limit` foods of the ranking that fit the slot and the exclusions"""
+        pool = []
+        seen = set()
+        for i, row in enumerate(ranking):
+            # A rare category can mean walking most of the catalog
+            if i % 1024 == 1023 and _time.perf_counter() > deadline:
+                stats["timed_out"] = True
+                break
+            food = self.foods[int(row)]
+            name = food["name"].lower()
+            props = {p.lower() for p in food["properties"]}
+            if category and food["category"].lower() != category:
+                continue
+            if food["id"] in exclude_ids or name in exclude_names or props & exclude_props:
+                continue
+            # Rows that only differ by id (duplicate catalog entries) are the same food
+            signature = (name, food["category"].lower(), frozenset(props))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            pool.append(food)
+            if limit and len(pool) >= limit:
+                break
+        return pool
+
+    def plan(self, age, season, time, size=3, categories=None, exclude_foods=None,
+             exclude_properties=None, required_properties=None, top_n=3,
+             beam_width=32, max_candidates=200, time_budget=1.0, catalog_version=None):
+        """Return the top-N meal plans found within `time_budget` seconds.
+
+        Pass the catalog version to reuse candidate rankings across calls.
+        """
+        started = _time.perf_counter()
+        deadline = started + time_budget
+
+        if categories:
+            slots = [c.lower() for c in categories]
+        else:
+            slots = [None] * size
+        size = len(slots)
+
+        exclude_names = {f.lower() for f in (exclude_foods or []) if isinstance(f, str)}
+        exclude_ids = {f for f in (exclude_foods or []) if isinstance(f, int)}
+        exclude_props = {p.lower() for p in (exclude_properties or [])}
+        required_props = {p.lower() for p in (required_properties or [])}
+
+        stats = {
+            "pairs_scored": 0,
+            "cache_hits": 0,
+            "nodes_expanded": 0,
+            "pruned": 0,
+            "iterations": 0,
+            "timed_out": False,
+        }
+        pair_cache = {}
+
+        def score_pair(a, b):
+            key = (a["id"], b["id"]) if a["id"] <= b["id"] else (b["id"], a["id"])
+            cached = pair_cache.get(key)
+            if cached is not None:
+                stats["cache_hits"] += 1
+                return cached
+            score = self.engine.analyze_compatibility(a, b, age, season, time)["score"]
+            pair_cache[key] = score
+            stats["pairs_scored"] += 1
+            return score
+
+        # For big catalogs only the most promising foods go into the search
+        ranking = self.ranking(catalog_version, age, season, time)
+        pools = {}
+        for category in set(slots):
+            pools[category] = self._candidates(
+                ranking, category, exclude_ids, exclude_names, exclude_props, max_candidates, deadline, stats
+            )
+        stats["candidates"] = {c or "any": len(p) for c, p in pools.items()}
+
+        total_pairs = size * (size - 1) // 2
+        best = {}  # frozenset(ids) -> (avg score, plan foods)
+
+        def worst_kept():
+            if not best or len(best) < top_n:
+                return None
+            return min(score for score, _ in best.values())
+
+        def record(plan, pair_sum):
+            key = frozenset(f["id"] for f in plan)
+            if key in best:
+                return
+            if required_props:
+                covered = set()
+                for f in plan:
+                    covered.update(p.lower() for p in f["properties"])
+                if not required_props.issubset(covered):
+                    return
+            avg = pair_sum / total_pairs if total_pairs else score_pair(plan[0], plan[0])
+            floor = worst_kept()
+            if floor is not None and avg <= floor:
+                return
+            best[key] = (avg, list(plan))
+            if len(best) > top_n:
+                del best[min(best, key=lambda k: best[k][0])]
+
+        width = 1
+        while True:
+            stats["iterations"] += 1
+            truncated = False
+            beam = [((), 0.0)]
+            for depth, slot in enumerate(slots):
+                remaining_pairs = total_pairs - (depth + 1) * depth // 2
+                children = {}
+                for plan, pair_sum in beam:
+                    names = {f["name"].lower() for f, _ in plan}
+                    last_index = plan[-1][1] if plan and slots[depth - 1] == slot else -1
+                    for index, food in enumerate(pools[slot]):
+                        if _time.perf_counter() > deadline:
+                            stats["timed_out"] = True
+                            break
+                        # Keep indexes increasing within a repeated slot so each
+                        # combination is visited once instead of once per permutation
+                        if index <= last_index or food["name"].lower() in names:
+                            continue
+                        stats["nodes_expanded"] += 1
+                        new_sum = pair_sum + sum(score_pair(food, f) for f, _ in plan)
+                        floor = worst_kept()
+                        if floor is not None and total_pairs and \
+                                (new_sum + remaining_pairs * MAX_PAIR_SCORE) / total_pairs <= floor:
+                            stats["pruned"] += 1
+                            continue
+                        child = plan + ((food, index),)
+                        key = frozenset(f["id"] for f, _ in child)
+                        if key not in children or children[key][1] < new_sum:
+                            children[key] = (child, new_sum)
+                    if stats["timed_out"]:
+                        break
+
+                ranked = sorted(children.values(), key=lambda c: c[1], reverse=True)
+                if depth == size - 1:
+                    for plan, pair_sum in ranked:
+                        record([f for f, _ in plan], pair_sum)
+                truncated = truncated or len(ranked) > width
+                beam = ranked[:width]
+                if stats["timed_out"] or not beam:
+                    break
+
+            # Widen the beam while there is time left; once no level had to
+            # drop children the pass was exhaustive and cannot improve
+            if stats["timed_out"] or not truncated:
+                break
+            width = beam_width if width < beam_width else width * 2
+
+        plans = []
+        for avg, plan in sorted(best.values(), key=lambda p: p[0], reverse=True):
+            pairs = [
+                {"foods": [a["name"], b["name"]], "score": score_pair(a, b)}
+                for a, b in combinations(plan, 2)
+            ]
+            plans.append({
+                "foods": [{"id": f["id"], "name": f["name"], "category": f["category"]} for f in plan],
+                "score": round(avg, 2),
+                "weakest_pair": min(pairs, key=lambda p: p["score"]) if pairs else None,
+                "pairs": pairs,
+            })
+
+        stats["elapsed_ms"] = round((_time.perf_counter() - started) * 1000, 2)
+        return {"plans": plans, "stats": stats}
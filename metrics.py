@@ -0,0 +1,271 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and histograms are plain dicts keyed by label values. Engine
+calls also run on threadpool threads (/plan_meal, catalog work), so
+updates and `render()` share one lock; uncontended, recording a sample
+still costs little more than a dict lookup and a bisect. `render()`
+produces the text format served on /metrics.
+"""
+import bisect
+import cProfile
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; tuned for an API whose fast paths take well under a millisecond
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            values = [(labels, list(series)) for labels, series in self.values.items()]
+        for labels, series in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', le))} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {series[-1]:.9g}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) - amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with _lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_LATENCY = Histogram(
+    "nutrisync_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+SCAN_STAGE_LATENCY = Histogram(
+    "nutrisync_scan_stage_duration_seconds",
+    "Time spent in each stage of /scan",
+    ("stage",),
+)
+ENGINE_CALLS = Counter(
+    "nutrisync_engine_calls_total",
+    "analyze_compatibility calls",
+)
+ENGINE_SECTION_HITS = Counter(
+    "nutrisync_engine_section_hits_total",
+    "analyze_compatibility rule sections that added a pro or con",
+    ("section",),
+)
+ENGINE_SECTION_LATENCY = Histogram(
+    "nutrisync_engine_section_duration_seconds",
+    "Time per analyze_compatibility rule section (sampled)",
+    ("section",),
+    buckets=(0.0000005, 0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.001),
+)
+CACHE_REQUESTS = Counter(
+    "nutrisync_cache_requests_total",
+    "Cache lookups by cache and outcome",
+    ("cache", "result"),
+)
+
+LIVE_SESSIONS = Gauge(
+    "nutrisync_live_sessions",
+    "Open live compatibility WebSocket sessions",
+)
+LIVE_SECTIONS_RECOMPUTED = Counter(
+    "nutrisync_live_sections_recomputed_total",
+    "Rule sections re-run by live compatibility sessions",
+    ("section",),
+)
+
+
+def record_cache(cache, hits, misses):
+    """Add a batch of cache lookups; hit ratio = hit / (hit + miss)"""
+    if hits:
+        CACHE_REQUESTS.inc(cache, "hit", amount=hits)
+    if misses:
+        CACHE_REQUESTS.inc(cache, "miss", amount=misses)
+
+
+class SectionProbe:
+    """Per-call hit counting and sampled timing for the engine's rule sections.
+
+    Hits are counted on every call. Timing costs a perf_counter call per
+    section, so only one call in `sample_every` is timed.
+    """
+
+    def __init__(self, sample_every=16):
+        self.sample_every = sample_every
+        self._calls = 0
+
+    def begin(self, pros, cons):
+        self._calls += 1
+        ENGINE_CALLS.inc()
+        timed = self.sample_every and self._calls % self.sample_every == 0
+        return _SectionRun(pros, cons, timed)
+
+
+class _SectionRun:
+    __slots__ = ("pros", "cons", "seen", "timed", "last")
+
+    def __init__(self, pros, cons, timed):
+        self.pros = pros
+        self.cons = cons
+        self.seen = 0
+        self.timed = timed
+        self.last = time.perf_counter() if timed else 0.0
+
+    def section(self, name):
+        seen = len(self.pros) + len(self.cons)
+        if seen != self.seen:
+            ENGINE_SECTION_HITS.inc(name)
+            self.seen = seen
+        if self.timed:
+            now = time.perf_counter()
+            ENGINE_SECTION_LATENCY.observe(now - self.last, name)
+            self.last = now
+
+
+class RequestProfiler:
+    """Opt-in cProfile dumps for individual requests.
+
+    Disabled unless NUTRISYNC_PROFILING=1. When enabled, a request carrying
+    the `X-Profile: 1` header is profiled, and NUTRISYNC_PROFILE_SAMPLE_RATE
+    additionally profiles a random fraction of all traffic. Dumps go to
+    NUTRISYNC_PROFILE_DIR (each path is logged) and can be opened with
+    pstats or snakeviz. Only one request is profiled at a time.
+
+    cProfile records the event loop thread, not the request: whatever other
+    requests run while the profiled one awaits shows up in its dump, and
+    work it hands to the threadpool does not.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("NUTRISYNC_PROFILING") == "1"
+        self.sample_rate = float(os.environ.get("NUTRISYNC_PROFILE_SAMPLE_RATE", "0"))
+        self.directory = os.environ.get(
+            "NUTRISYNC_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "nutrisync-profiles")
+        )
+        self.active = False
+
+    def wants(self, headers):
+        if not self.enabled or self.active:
+            return False
+        if headers.get("x-profile") == "1":
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        self.active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile, route):
+        profile.disable()
+        self.active = False
+        os.makedirs(self.directory, exist_ok=True)
+        safe_route = route.strip("/").replace("/", "_") or "root"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_route}.prof")
+        profile.dump_stats(path)
+        return path
+
+
+profiler = RequestProfiler()
@@ -2,6 +2,8 @@
 const CACHE_NAME = 'nutrisync-v1';
 const STATIC_CACHE = 'nutrisync-static-v1';
 const DYNAMIC_CACHE = 'nutrisync-dynamic-v1';
+// Ports the backend API has been served from (8002 is the current default)
+const API_PORTS = ['8001', '8002'];
 
 // Files to cache immediately
 const STATIC_ASSETS = [
@@ -46,18 +48,21 @@ self.addEventListener('fetch', (event) => {
   const { request } = event;
   const url = new URL(request.url);
 
-  // Skip cross-origin requests
-  if (url.origin !== location.origin) {
+  const isApiRequest = url.pathname.startsWith('/api/') || API_PORTS.includes(url.port);
+
+  // Skip cross-origin requests other than the API
+  if (url.origin !== location.origin && !isApiRequest) {
     return;
   }
 
   // Handle API requests differently
-  if (url.pathname.startsWith('/api/') || url.port === '8001') {
+  if (isApiRequest) {
     event.respondWith(
       fetch(request)
         .then((response) => {
-          // Cache successful API responses
-          if (response.ok) {
+          // Cache successful API responses (the Cache API only stores GETs,
+          // which covers /foods and the /catalog bundle and delta)
+          if (response.ok && request.method === 'GET') {
             const responseClone = response.clone();
             caches.open(DYNAMIC_CACHE).then((cache) => {
               cache.put(request, responseClone);
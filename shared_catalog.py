@@ -0,0 +1,379 @@
+"""Read-only food catalog snapshot shared by all uvicorn workers.
+
+A single loader process parses food.csv once and writes the catalog, the
+similarity index arrays, row hashes and the score table into one flat
+file (by default under /dev/shm, so it lives in shared memory). Workers
+mmap that file and read straight out of it, so adding workers adds
+page-table entries rather than another copy of the catalog.
+
+Every rebuild writes a new `catalog-<generation>.bin` and then atomically
+points the CURRENT file at it; attached workers notice the new generation
+and re-attach on their next check. The previous generation stays on disk
+until the rebuild after, so a worker that read CURRENT just before the
+switch can still open the file it names.
+
+    python shared_catalog.py build --csv food.csv --dir /dev/shm/nutrisync
+"""
+import argparse
+import json
+import mmap
+import os
+import tempfile
+import time
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+MAGIC = b"NSCAT001"
+ALIGNMENT = 64
+CURRENT_FILE = "CURRENT"
+# Generations kept on disk: the current one and the one before it
+KEEP_GENERATIONS = 2
+
+
+def default_dir():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "nutrisync")
+
+
+def read_food_csv(csv_path):
+    """Parse food.csv into food dicts, properties split into lists.
+
+    backend.load_foods, snapshot builds and the analytics CLI all parse
+    with this, so they see the same rows. pandas is imported here rather
+    than at module load, so workers attached to a snapshot never load it.
+    """
+    import pandas as pd
+
+    foods_df = pd.read_csv(csv_path)
+
+    def parse_properties(prop_str):
+        if pd.isna(prop_str):
+            return []
+        if isinstance(prop_str, str):
+            return [p.strip() for p in prop_str.split(',')]
+        return []
+
+    foods_df['properties'] = foods_df['properties'].apply(parse_properties)
+    return foods_df.to_dict('records')
+
+
+def _encode_strings(values):
+    blob = bytearray()
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    for i, value in enumerate(values):
+        blob += str(value).encode("utf-8")
+        offsets[i + 1] = len(blob)
+    return offsets, np.frombuffer(bytes(blob), dtype=np.uint8)
+
+
+def _vocab_codes(values):
+    vocab = {}
+    codes = np.array([vocab.setdefault(v, len(vocab)) for v in values], dtype=np.int32)
+    return list(vocab), codes
+
+
+def _file_generation(filename):
+    try:
+        return int(filename[len("catalog-"):-len(".bin")])
+    except ValueError:
+        return None
+
+
+def _current_generation(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as fh:
+            return int(fh.read().strip().split("-")[1].split(".")[0])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def build_snapshot(foods, directory=None, arrays=None):
+    """Write a new catalog generation and make it current. Returns its path."""
+    from similarity_index import PropertySimilarityIndex
+
+    directory = directory or default_dir()
+    os.makedirs(directory, exist_ok=True)
+    generation = _current_generation(directory) + 1
+
+    category_vocab, category_codes = _vocab_codes([f["category"] for f in foods])
+    season_vocab, season_codes = _vocab_codes([f.get("season", "all") for f in foods])
+
+    property_vocab = {}
+    prop_offsets = np.zeros(len(foods) + 1, dtype=np.int64)
+    prop_codes = []
+    for i, food in enumerate(foods):
+        prop_codes.extend(property_vocab.setdefault(p, len(property_vocab)) for p in food["properties"])
+        prop_offsets[i + 1] = len(prop_codes)
+
+    # Inverse of prop_offsets/prop_codes: the rows having each property
+    prop_codes_array = np.array(prop_codes, dtype=np.int32)
+    prop_rows = np.repeat(np.arange(len(foods), dtype=np.int64), np.diff(prop_offsets))
+    order = np.argsort(prop_codes_array, kind="stable")
+    property_rows = prop_rows[order]
+    property_row_offsets = np.zeros(len(property_vocab) + 1, dtype=np.int64)
+    property_row_offsets[1:] = np.cumsum(np.bincount(prop_codes_array, minlength=len(property_vocab)))
+
+    name_offsets, name_blob = _encode_strings([f["name"] for f in foods])
+    ids = np.array([f["id"] for f in foods], dtype=np.int64)
+    id_order = np.argsort(ids, kind="stable").astype(np.int64)
+    lower_names = [f["name"].lower() for f in foods]
+    # Rows ordered by lowercase name, ties by row, for name lookups
+    name_order = np.array(sorted(range(len(foods)), key=lower_names.__getitem__), dtype=np.int64)
+    index = PropertySimilarityIndex(foods)
+
+    payload = {
+        "ids": ids,
+        "id_order": id_order,
+        "sorted_ids": ids[id_order],
+        "name_offsets": name_offsets,
+        "name_blob": name_blob,
+        "name_order": name_order,
+        "category_codes": category_codes,
+        "season_codes": season_codes,
+        "prop_offsets": prop_offsets,
+        "prop_codes": prop_codes_array,
+        "property_row_offsets": property_row_offsets,
+        "property_rows": property_rows,
+        "sim_bits": index.bits,
+        "sim_names": index.names,
+        "sim_sizes": index.sizes,
+        "sim_weights": index.weights,
+    }
+    payload.update(arrays or {})
+
+    layout = {}
+    offset = 0
+    for name, array in payload.items():
+        array = np.ascontiguousarray(array)
+        payload[name] = array
+        offset = (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += array.nbytes
+
+    header = json.dumps({
+        "generation": generation,
+        "count": len(foods),
+        "created": time.time(),
+        "category_vocab": category_vocab,
+        "season_vocab": season_vocab,
+        "property_vocab": list(property_vocab),
+        "similarity_properties": list(index.property_ids),
+        "arrays": layout,
+    }).encode("utf-8")
+    data_start = (len(MAGIC) + 8 + len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    filename = f"catalog-{generation}.bin"
+    path = os.path.join(directory, filename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(len(header).to_bytes(8, "little"))
+        fh.write(header)
+        for name, array in payload.items():
+            fh.seek(data_start + layout[name]["offset"])
+            fh.write(array.tobytes())
+        fh.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+    current_tmp = os.path.join(directory, CURRENT_FILE + ".tmp")
+    with open(current_tmp, "w") as fh:
+        fh.write(filename)
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    # Workers still mapping an older generation keep their pages until they
+    # re-attach; unlinking only removes the name. The previous generation is
+    # left alone: a worker may have read the old CURRENT and not opened it yet
+    for entry in os.listdir(directory):
+        if entry.startswith("catalog-") and entry.endswith(".bin"):
+            entry_generation = _file_generation(entry)
+            if entry_generation is not None and entry_generation <= generation - KEEP_GENERATIONS:
+                os.unlink(os.path.join(directory, entry))
+    return path
+
+
+class FoodRecord(Mapping):
+    """Dict-like view of one catalog row, decoded on access"""
+
+    __slots__ = ("_catalog", "_row")
+    _keys = ("id", "name", "category", "season", "properties")
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, key):
+        c = self._catalog
+        row = self._row
+        if key == "id":
+            return int(c.ids[row])
+        if key == "name":
+            return c.name(row)
+        if key == "category":
+            return c.category_vocab[c.category_codes[row]]
+        if key == "season":
+            return c.season_vocab[c.season_codes[row]]
+        if key == "properties":
+            codes = c.prop_codes[c.prop_offsets[row]:c.prop_offsets[row + 1]]
+            return [c.property_vocab[code] for code in codes]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class FoodSequence(Sequence):
+    """List-like view over all catalog rows"""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return self._catalog.count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [FoodRecord(self._catalog, r) for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return FoodRecord(self._catalog, row)
+
+
+class SharedCatalog:
+    """A worker's read-only, zero-copy attachment to the current snapshot"""
+
+    def __init__(self, directory, path):
+        self.directory = directory
+        self.path = path
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header_len = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], "little")
+        header_end = len(MAGIC) + 8 + header_len
+        self.header = json.loads(self._mmap[len(MAGIC) + 8:header_end])
+        data_start = (header_end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+        self.generation = self.header["generation"]
+        self.count = self.header["count"]
+        self.category_vocab = self.header["category_vocab"]
+        self.season_vocab = self.header["season_vocab"]
+        self.property_vocab = self.header["property_vocab"]
+
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                                  offset=data_start + spec["offset"])
+            self.arrays[name] = array.reshape(spec["shape"])
+
+        for name in ("ids", "id_order", "name_offsets", "name_blob", "name_order", "category_codes",
+                     "season_codes", "prop_offsets", "prop_codes", "sorted_ids",
+                     "property_row_offsets", "property_rows"):
+            setattr(self, name, self.arrays[name])
+        self._property_codes = {}  # lowercase property -> vocab codes
+        for code, prop in enumerate(self.property_vocab):
+            self._property_codes.setdefault(prop.lower(), []).append(code)
+
+        self.foods = FoodSequence(self)
+        self._checked_at = time.monotonic()
+
+    @classmethod
+    def attach(cls, directory=None, attempts=3):
+        directory = directory or default_dir()
+        for attempt in range(attempts):
+            with open(os.path.join(directory, CURRENT_FILE)) as fh:
+                filename = fh.read().strip()
+            try:
+                return cls(directory, os.path.join(directory, filename))
+            except FileNotFoundError:
+                # Rebuilds in quick succession removed the generation CURRENT
+                # named when it was read; the new CURRENT names a newer one
+                if attempt == attempts - 1:
+                    raise
+
+    def get(self, food_id):
+        """Look a food up by id with a binary search over the sorted ids"""
+        pos = int(np.searchsorted(self.sorted_ids, food_id))
+        if pos < self.count and self.sorted_ids[pos] == food_id:
+            return FoodRecord(self, int(self.id_order[pos]))
+        return None
+
+    def name(self, row):
+        return self.name_blob[self.name_offsets[row]:self.name_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def get_by_name(self, name):
+        """First row with this name (case-insensitive), by binary search over the name order"""
+        name = name.lower()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(int(self.name_order[mid])).lower() < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            row = int(self.name_order[lo])
+            if self.name(row).lower() == name:
+                return FoodRecord(self, row)
+        return None
+
+    def rows_with_property(self, prop):
+        """Rows whose properties include `prop` (case-insensitive), in row order"""
+        codes = self._property_codes.get(prop.lower(), [])
+        parts = [self.property_rows[self.property_row_offsets[c]:self.property_row_offsets[c + 1]] for c in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.unique(np.concatenate(parts)) if parts else self.property_rows[:0]
+
+    def similarity_index(self):
+        """Build a PropertySimilarityIndex over the shared arrays without copying"""
+        from similarity_index import PropertySimilarityIndex
+
+        return PropertySimilarityIndex.from_arrays(
+            self.foods,
+            self.header["similarity_properties"],
+            self.arrays["sim_bits"],
+            self.arrays["sim_names"],
+            self.arrays["sim_sizes"],
+            self.arrays["sim_weights"],
+        )
+
+    def is_stale(self, check_interval=1.0):
+        """True once the loader has published a newer generation"""
+        now = time.monotonic()
+        if now - self._checked_at < check_interval:
+            return False
+        self._checked_at = now
+        return _current_generation(self.directory) != self.generation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the shared catalog snapshot for uvicorn workers")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--csv", default="food.csv")
+    parser.add_argument("--dir", default=default_dir())
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from catalog_bundle import catalog_arrays
+
+        foods = read_food_csv(args.csv)
+        path = build_snapshot(foods, args.dir, arrays=catalog_arrays(foods))
+        print(f"Wrote {len(foods)} foods to {path} (generation {_current_generation(args.dir)})")
+    else:
+        catalog = SharedCatalog.attach(args.dir)
+        print(f"{catalog.path}: generation {catalog.generation}, {catalog.count} foods, "
+              f"{os.path.getsize(catalog.path)} bytes")
+        for name, array in catalog.arrays.items():
+            print(f"  {name}: {array.dtype} {array.shape}")
@@ -0,0 +1,190 @@
+import numpy as np
+
+# popcount for every byte value, used when numpy has no bitwise_count (< 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_rows(words):
+    """Count set bits per row of a (n, words) uint64 matrix"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class PropertySimilarityIndex:
+    """Rank foods by overlap of their property sets.
+
+    Every property is interned to a bit position and each food is stored as
+    a row of uint64 words, so a query is a handful of vectorized AND/OR and
+    popcount passes over the whole catalog instead of per-food set
+    intersections. Required and excluded properties become bit masks.
+    """
+
+    def __init__(self, foods):
+        self.foods = foods
+        self.property_ids = {}
+        for food in foods:
+            for prop in food["properties"]:
+                self.property_ids.setdefault(prop.strip().lower(), len(self.property_ids))
+
+        self.n_words = max(1, (len(self.property_ids) + 63) // 64)
+        self.bits = np.zeros((len(foods), self.n_words), dtype=np.uint64)
+        for row, food in enumerate(foods):
+            self.bits[row] = self._mask(food["properties"])
+        self.sizes = _popcount_rows(self.bits)
+        self.names = np.array([f["name"].lower().encode("utf-8") for f in foods], dtype=np.bytes_)
+
+        # Rare properties say more about a food than ones almost everything has
+        self.counts = np.zeros(len(self.property_ids), dtype=np.float64)
+        for food in foods:
+            for prop in {p.strip().lower() for p in food["properties"]}:
+                self.counts[self.property_ids[prop]] += 1
+        self.weights = np.log((1 + len(foods)) / (1 + self.counts)) + 1.0
+        self._dense = None
+        self._buffers = None
+
+    @classmethod
+    def from_arrays(cls, foods, properties, bits, names, sizes, weights):
+        """Wrap prebuilt arrays (e.g. a shared catalog snapshot) without copying"""
+        index = cls.__new__(cls)
+        index.foods = foods
+        index.property_ids = {prop: i for i, prop in enumerate(properties)}
+        index.n_words = bits.shape[1]
+        index.bits = bits
+        index.sizes = sizes
+        index.names = names
+        index.weights = weights
+        index.counts = None
+        index._dense = None
+        index._buffers = None
+        return index
+
+    def upsert(self, rows, foods):
+        """Write `foods` at catalog positions `rows`, in place of the rows
+        already there or appended at the end.
+
+        The arrays live in buffers that grow by doubling, so a bulk import
+        that calls this once per chunk stays linear in the number of rows.
+        """
+        if not foods:
+            return
+        for food in foods:
+            for prop in food["properties"]:
+                self.property_ids.setdefault(prop.strip().lower(), len(self.property_ids))
+        n_words = max(self.n_words, (len(self.property_ids) + 63) // 64)
+        count = len(self.bits)
+        total = max(count, max(rows) + 1)
+
+        if self.counts is None:
+            self.counts = self._property_counts(self.bits)
+        if len(self.counts) < len(self.property_ids):
+            self.counts = np.concatenate([self.counts, np.zeros(len(self.property_ids) - len(self.counts))])
+
+        rows = np.asarray(rows, dtype=np.int64)
+        replaced = rows[rows < count]
+        if len(replaced):
+            self.counts -= self._property_counts(self.bits[replaced])
+
+        width = max(len(f["name"].lower().encode("utf-8")) for f in foods)
+        self._reserve(total, n_words, width)
+        bits_buf, sizes_buf, names_buf = self._buffers
+        self.n_words = n_words
+        self.bits = bits_buf[:total]
+        self.sizes = sizes_buf[:total]
+        self.names = names_buf[:total]
+
+        masks = np.array([self._mask(f["properties"]) for f in foods], dtype=np.uint64)
+        self.bits[rows] = masks
+        self.sizes[rows] = _popcount_rows(masks)
+        self.names[rows] = [f["name"].lower().encode("utf-8") for f in foods]
+        self.counts += self._property_counts(masks)
+        self.weights = np.log((1 + total) / (1 + self.counts)) + 1.0
+        self._dense = None
+
+    def _property_counts(self, bits):
+        unpacked = np.unpackbits(np.ascontiguousarray(bits).view(np.uint8), axis=1, bitorder="little")
+        counts = unpacked[:, :len(self.property_ids)].sum(axis=0, dtype=np.float64)
+        return np.pad(counts, (0, len(self.property_ids) - len(counts)))
+
+    def _reserve(self, rows, n_words, name_width):
+        """Make sure the backing buffers hold `rows` rows of the given widths"""
+        if self._buffers is not None:
+            bits_buf, sizes_buf, names_buf = self._buffers
+            if (len(bits_buf) >= rows and bits_buf.shape[1] == n_words
+                    and names_buf.dtype.itemsize >= name_width):
+                return
+        capacity = max(rows, 2 * len(self.bits), 64)
+        count = len(self.bits)
+        bits_buf = np.zeros((capacity, n_words), dtype=np.uint64)
+        bits_buf[:count, :self.bits.shape[1]] = self.bits
+        sizes_buf = np.zeros(capacity, dtype=np.int32)
+        sizes_buf[:count] = self.sizes
+        width = max(name_width, self.names.dtype.itemsize, 1)
+        names_buf = np.zeros(capacity, dtype=f"S{width}")
+        names_buf[:count] = self.names
+        self._buffers = (bits_buf, sizes_buf, names_buf)
+
+    def _mask(self, properties):
+        mask = np.zeros(self.n_words, dtype=np.uint64)
+        for prop in properties:
+            bit = self.property_ids.get(prop.strip().lower())
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def _dense_matrix(self):
+        # Built on first weighted query only; jaccard never needs it
+        if self._dense is None:
+            as_bytes = self.bits.view(np.uint8)
+            unpacked = np.unpackbits(as_bytes, axis=1, bitorder="little")
+            self._dense = unpacked[:, :len(self.property_ids)].astype(np.float32)
+        return self._dense
+
+    def similar(self, food=None, properties=None, require=None, exclude=None,
+                limit=10, metric="jaccard"):
+        """Return the `limit` foods most similar to `food` or a property list"""
+        if food is not None:
+            properties = list(food["properties"]) + list(properties or [])
+        query = self._mask(properties or [])
+        required = self._mask(require or [])
+        excluded = self._mask(exclude or [])
+
+        # Unknown required properties can never be satisfied
+        if require and any(p.strip().lower() not in self.property_ids for p in require):
+            return []
+
+        keep = np.all((self.bits & required) == required, axis=1)
+        keep &= ~np.any(self.bits & excluded, axis=1)
+        if food is not None:
+            keep &= self.names != food["name"].lower().encode("utf-8")
+
+        if metric == "weighted":
+            dense = self._dense_matrix()
+            query_dense = np.unpackbits(query.view(np.uint8), bitorder="little")[:len(self.property_ids)]
+            query_weight = float(query_dense @ self.weights)
+            overlap = dense @ (query_dense * self.weights).astype(np.float32)
+            union = dense @ self.weights.astype(np.float32) + query_weight - overlap
+        else:
+            overlap = _popcount_rows(self.bits & query).astype(np.float64)
+            union = self.sizes + int(_popcount_rows(query[None, :])[0]) - overlap
+
+        scores = np.divide(overlap, union, out=np.zeros(len(self.foods)), where=union > 0)
+        scores[~keep] = -1.0
+
+        limit = min(limit, int(keep.sum()))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.lexsort((top, -scores[top]))]
+
+        results = []
+        for row in top:
+            f = self.foods[row]
+            results.append({
+                "id": f["id"],
+                "name": f["name"],
+                "category": f["category"],
+                "similarity": round(float(scores[row]), 3),
+                "properties": f["properties"],
+            })
+        return results
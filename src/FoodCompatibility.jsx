@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import Select from 'react-select';
 import axios from 'axios';
 import { Leaf } from 'lucide-react';
@@ -142,6 +142,43 @@ const FoodCompatibility = ({ activeTab }) => {
     });
   }, [activeTab]);
 
+  // Live session: after the first analysis, every input change is pushed over
+  // a WebSocket and the server re-runs only the rules that input affects
+  const liveSocket = useRef(null);
+  const liveSeq = useRef(0);
+
+  useEffect(() => {
+    if (activeTab !== 'check') return;
+    const ws = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/ws/compatibility`);
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      // Ignore answers to updates that have since been superseded
+      if (msg.type === 'result' && msg.result && msg.seq === liveSeq.current) {
+        setResult(prev => (prev ? msg.result : prev));
+      }
+    };
+    liveSocket.current = ws;
+    return () => {
+      ws.close();
+      liveSocket.current = null;
+    };
+  }, [activeTab]);
+
+  useEffect(() => {
+    const ws = liveSocket.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !selectedFood1 || !selectedFood2) return;
+    liveSeq.current += 1;
+    // The server diffs against its copy, so sending the whole selection is cheap
+    ws.send(JSON.stringify({
+      food1_id: selectedFood1.value,
+      food2_id: selectedFood2.value,
+      age: parseInt(contextData.age) || 30,
+      season: contextData.season,
+      time: contextData.time,
+      seq: liveSeq.current
+    }));
+  }, [selectedFood1, selectedFood2, contextData]);
+
   const handleContextChange = (e) => {
     setContextData({
       ...contextData,
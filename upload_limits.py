@@ -0,0 +1,126 @@
+"""Bounded handling of image uploads for /scan.
+
+`UploadLimitMiddleware` rejects oversized request bodies while they stream
+in: a too-large Content-Length is refused before any body is read, and a
+chunked upload is cut off as soon as it crosses the cap. The multipart
+parser spools the file part to memory (small uploads) or a temp file
+(large ones); `open_upload_image` then reads it in place, mmapping the
+temp file rather than copying it into a bytes object, and checks the
+image dimensions from the header before anything is decoded.
+"""
+import mmap
+import os
+from contextlib import contextmanager
+
+from PIL import Image
+
+MAX_UPLOAD_BYTES = int(os.environ.get("NUTRISYNC_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.environ.get("NUTRISYNC_MAX_IMAGE_PIXELS", 30_000_000))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware capping request body size for the given paths"""
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, paths=("/scan",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_bytes:
+                    return await self._reject(send)
+
+        received = 0
+        overflowed = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, overflowed
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    overflowed = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # The framework answers an aborted body with its own parse
+            # error; drop that and send the 413 below instead
+            if overflowed and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not overflowed or response_started:
+                raise
+        if overflowed and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = (
+            b'{"success": false, "error": "Upload too large: the limit is '
+            + str(self.max_bytes).encode()
+            + b' bytes"}'
+        )
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+@contextmanager
+def open_upload_image(upload, max_pixels=MAX_IMAGE_PIXELS):
+    """Open an UploadFile as a PIL image without copying it into memory.
+
+    Raises ImageTooLarge when the header declares more than `max_pixels`,
+    before the pixel data is decoded.
+    """
+    spooled = upload.file
+    spooled.seek(0)
+    mapped = None
+    # SpooledTemporaryFile sets _rolled once the part has spilled to disk;
+    # map that file instead of reading it, small parts are read in place
+    if getattr(spooled, "_rolled", False):
+        mapped = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+        source = mapped
+    else:
+        source = spooled
+
+    image = None
+    try:
+        image = Image.open(source)
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageTooLarge(f"Image is {width}x{height}; the limit is {max_pixels:,} pixels")
+        image.load()
+        yield image
+    finally:
+        if image is not None:
+            image.close()
+        if mapped is not None:
+            mapped.close()